@@ -1,4 +1,5 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -9,7 +10,11 @@ from telegram.ext import (
 )
 from database import Database
 from scraper import AmulAPI
+from bot.state import create_state_store
+import asyncio
 import logging
+import re
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -17,52 +22,94 @@ logger = logging.getLogger(__name__)
 db = Database()
 amul_api = AmulAPI()
 
-# Global state tracking (more reliable than context.user_data)
-USER_STATES = {}
+# Per-user conversation state; in-memory by default, Redis when REDIS_URL is
+# set so state survives being routed to a different bot process
+state_store = create_state_store()
+
+# Strict ASCII-digit check; str.isdigit also accepts Unicode digits that the
+# Amul API would reject anyway. Indian pincodes never start with 0 or 9, so
+# those typos are rejected here without burning a network lookup.
+_PINCODE_RE = re.compile(r"^[1-8][0-9]{5}$")
+
+
+# Main menu keyboards are immutable and depend only on whether the user has a
+# pincode, so build both variants once at import instead of on every update.
+_MENU_WITH_PIN = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("🛒 Products", callback_data="cb_products"),
+        InlineKeyboardButton("📊 Status", callback_data="cb_mystatus")
+    ],
+    [
+        InlineKeyboardButton("📦 Check Stock", callback_data="cb_instock"),
+        InlineKeyboardButton("📍 Change Pin", callback_data="cb_setpincode")
+    ],
+    [
+        InlineKeyboardButton("❓ Help", callback_data="cb_help"),
+        InlineKeyboardButton("🔕 Stop Alerts", callback_data="cb_stop")
+    ]
+])
 
+_MENU_NO_PIN = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📍 Set Pincode", callback_data="cb_setpincode")],
+    [InlineKeyboardButton("❓ Help", callback_data="cb_help")]
+])
 
-def get_main_menu_keyboard(has_pincode=False):
-    """Get modern main menu keyboard"""
-    if has_pincode:
-        return InlineKeyboardMarkup([
-            [
-                InlineKeyboardButton("🛒 Products", callback_data="cb_products"),
-                InlineKeyboardButton("📊 Status", callback_data="cb_mystatus")
-            ],
-            [
-                InlineKeyboardButton("📦 Check Stock", callback_data="cb_instock"),
-                InlineKeyboardButton("📍 Change Pin", callback_data="cb_setpincode")
-            ],
-            [
-                InlineKeyboardButton("❓ Help", callback_data="cb_help"),
-                InlineKeyboardButton("🔕 Stop Alerts", callback_data="cb_stop")
-            ]
-        ])
-    else:
-        return InlineKeyboardMarkup([
-            [InlineKeyboardButton("📍 Set Pincode", callback_data="cb_setpincode")],
-            [InlineKeyboardButton("❓ Help", callback_data="cb_help")]
-        ])
+# Static texts and keyboards reused on every call - built once at import
+CANCEL_KB = InlineKeyboardMarkup([[InlineKeyboardButton("❌ Cancel", callback_data="cb_cancel")]])
 
+STOP_CONFIRM_KB = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("✅ Yes, Stop All", callback_data="confirm_stop"),
+        InlineKeyboardButton("❌ No, Keep", callback_data="cancel_stop")
+    ]
+])
 
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /start command"""
-    # Clear any pending state
-    user_id = update.effective_user.id
-    USER_STATES.pop(user_id, None)
+LOADING_PRODUCTS_MSG = "🔄 *Loading Products...*\n\n⏳ _Fetching latest stock data..._"
+LOADING_STOCK_MSG = "📦 *Checking Stock...*\n\n⏳ _Fetching live data..._"
+LOADING_PINCODE_MSG = "🔍 *Checking pincode...*\n\n⏳ _Please wait, this may take 10-15 seconds..._"
 
-    user = update.effective_user
-    db.add_user(user.id, user.username, user.first_name)
+PINCODE_PROMPT_NEW = """
+📍 *Set Your Pincode*
 
-    existing_user = db.get_user(user.id)
-    has_pincode = existing_user and existing_user.get("pincode")
+━━━━━━━━━━━━━━━━━━━━━━
+Enter your 6-digit delivery pincode:
+
+_Example: 400001_
+"""
+
+PINCODE_PROMPT_CHANGE_TMPL = """
+📍 *Change Pincode*
+
+Your current pincode: *{}*
+
+━━━━━━━━━━━━━━━━━━━━━━
+Enter new 6-digit pincode:
+"""
+
+PINCODE_PROMPT_NEW_CB = """
+📍 *Set Your Pincode*
+
+━━━━━━━━━━━━━━━━━━━━━━
+*Type your 6-digit delivery pincode:*
+
+_Example: 400063_
+"""
+
+PINCODE_PROMPT_CHANGE_CB_TMPL = """
+📍 *Change Pincode*
+
+Your current pincode: *{}*
 
-    welcome_message = f"""
+━━━━━━━━━━━━━━━━━━━━━━
+*Type your new 6-digit pincode:*
+"""
+
+WELCOME_TMPL = """
 ╔══════════════════════════════════╗
      🥛 *AMUL PROTEIN ALERTS* 🥛
 ╚══════════════════════════════════╝
 
-Hey *{user.first_name}*! 👋
+Hey *{first_name}*! 👋
 
 I'll notify you *instantly* when Amul protein products are back in stock at your location.
 
@@ -74,24 +121,11 @@ I'll notify you *instantly* when Amul protein products are back in stock at your
 3️⃣  Get instant alerts! 🔔
 
 """
-    if has_pincode:
-        welcome_message += f"✅ Your pincode: *{existing_user['pincode']}*\n\n"
-        welcome_message += "👇 *Choose an option below:*"
-    else:
-        welcome_message += "👇 *Let's start by setting your pincode:*"
-
-    reply_markup = get_main_menu_keyboard(has_pincode)
-    await update.message.reply_text(welcome_message, parse_mode="Markdown", reply_markup=reply_markup)
-
 
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /help command"""
-    USER_STATES.pop(update.effective_user.id, None)
+WELCOME_HAS_PIN_TMPL = "✅ Your pincode: *{pincode}*\n\n👇 *Choose an option below:*"
+WELCOME_NO_PIN = "👇 *Let's start by setting your pincode:*"
 
-    user = db.get_user(update.effective_user.id)
-    has_pincode = user and user.get("pincode")
-
-    help_text = """
+HELP_TEXT = """
 ╔══════════════════════════════════╗
           ❓ *HELP CENTER*
 ╚══════════════════════════════════╝
@@ -122,41 +156,174 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 ━━━━━━━━━━━━━━━━━━━━━━
 💡 *Need more help?* Just send any message!
 """
+
+HELP_TEXT_SHORT = """
+╔══════════════════════════════════╗
+          ❓ *HELP CENTER*
+╚══════════════════════════════════╝
+
+*🔹 How It Works:*
+1️⃣ Set your pincode
+2️⃣ Choose products to track
+3️⃣ I check stock every 30 sec
+4️⃣ Get notified when available!
+
+*🔹 Tips:*
+• Tap buttons for quick actions
+• You can track multiple products
+"""
+
+STOP_CONFIRM_MSG = (
+    "⚠️ *Stop Notifications?*\n\n"
+    "This will unsubscribe you from all product alerts.\n\n"
+    "Are you sure?"
+)
+
+# Footer rows of the product-selection keyboard never change
+PRODUCTS_FOOTER_ROWS = [
+    [
+        InlineKeyboardButton("✅ Save & Continue", callback_data="products_done"),
+        InlineKeyboardButton("🔄 Refresh", callback_data="cb_products")
+    ],
+    [InlineKeyboardButton("🏠 Main Menu", callback_data="cb_start")]
+]
+
+
+def _product_row(product, idx, is_subscribed):
+    """Build the single keyboard row for one product.
+
+    callback_data carries the catalog index ("t_3") rather than the full SKU:
+    Telegram caps callback_data at 64 bytes and echoes it on every tap, so a
+    couple of bytes beat a 10-30 char SKU. The index maps back to a SKU via
+    user_data["sku_by_idx"].
+    """
+    sub_icon = "✅" if is_subscribed else "⬜"
+    stock_icon = "🟢" if product.get("in_stock", False) else "🔴"
+    name = product.get("display_name") or product["name"][:28]
+    return [InlineKeyboardButton(f"{sub_icon} {name} {stock_icon}", callback_data=f"t_{idx}")]
+
+
+def get_main_menu_keyboard(has_pincode=False):
+    """Get modern main menu keyboard"""
+    return _MENU_WITH_PIN if has_pincode else _MENU_NO_PIN
+
+
+# Single-flight registries: concurrent identical scraper calls (several users
+# in the same area tapping within seconds) await one shared future instead of
+# each firing their own 10-15s scrape.
+_PRODUCTS_INFLIGHT = {}
+_PINCODE_INFLIGHT = {}
+
+# The shared amul_api keeps the current pincode as instance state, so the
+# set-pincode/fetch pair must not interleave across substores; same guard
+# the stock monitor takes with its _scrape_lock
+_scrape_lock = asyncio.Lock()
+
+# Last fetched catalog per substore, shared across all users in that area so
+# a toggle from a fresh chat doesn't need its own full-table DB read
+_SHARED_PRODUCTS = {}  # substore_id -> (monotonic timestamp, products)
+SHARED_PRODUCTS_TTL = 300
+
+
+async def _fetch_products_shared(pincode, substore_id):
+    """Fetch the product list for a substore, collapsing concurrent callers"""
+    fut = _PRODUCTS_INFLIGHT.get(substore_id)
+    if fut is not None:
+        return await fut
+
+    fut = asyncio.get_running_loop().create_future()
+    _PRODUCTS_INFLIGHT[substore_id] = fut
+    try:
+        async with _scrape_lock:
+            await asyncio.to_thread(amul_api.set_pincode, pincode, substore_id)
+            products = await asyncio.to_thread(amul_api.get_protein_products, substore_id)
+        fut.set_result(products)
+        return products
+    except Exception as e:
+        if not fut.done():
+            fut.set_exception(e)
+            # Mark retrieved: with no concurrent waiters nobody ever awaits
+            # the future, and asyncio would log the exception at GC time
+            fut.exception()
+        raise
+    finally:
+        _PRODUCTS_INFLIGHT.pop(substore_id, None)
+
+
+async def _search_pincode_shared(pincode):
+    """Look up a pincode, collapsing concurrent identical lookups"""
+    fut = _PINCODE_INFLIGHT.get(pincode)
+    if fut is not None:
+        return await fut
+
+    fut = asyncio.get_running_loop().create_future()
+    _PINCODE_INFLIGHT[pincode] = fut
+    try:
+        # search_pincode mutates the same instance state the fetch pair
+        # reads, so it takes the scrape lock too
+        async with _scrape_lock:
+            info = await asyncio.to_thread(amul_api.search_pincode, pincode)
+        fut.set_result(info)
+        return info
+    except Exception as e:
+        if not fut.done():
+            fut.set_exception(e)
+            # Mark retrieved, as above: a solo caller leaves it unawaited
+            fut.exception()
+        raise
+    finally:
+        _PINCODE_INFLIGHT.pop(pincode, None)
+
+
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /start command"""
+    # Clear any pending state
+    user_id = update.effective_user.id
+    await state_store.pop(user_id)
+
+    user = update.effective_user
+    await db.add_user(user.id, user.username, user.first_name)
+
+    existing_user = await db.get_user(user.id)
+    has_pincode = existing_user and existing_user.get("pincode")
+
+    welcome_message = WELCOME_TMPL.format(first_name=user.first_name)
+    if has_pincode:
+        welcome_message += WELCOME_HAS_PIN_TMPL.format(pincode=existing_user["pincode"])
+    else:
+        welcome_message += WELCOME_NO_PIN
+
+    reply_markup = get_main_menu_keyboard(has_pincode)
+    await update.message.reply_text(welcome_message, parse_mode="Markdown", reply_markup=reply_markup)
+
+
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /help command"""
+    await state_store.pop(update.effective_user.id)
+
+    user = await db.get_user(update.effective_user.id)
+    has_pincode = user and user.get("pincode")
+
     reply_markup = get_main_menu_keyboard(has_pincode)
-    await update.message.reply_text(help_text, parse_mode="Markdown", reply_markup=reply_markup)
+    await update.message.reply_text(HELP_TEXT, parse_mode="Markdown", reply_markup=reply_markup)
 
 
 async def set_pincode_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start pincode setting from command"""
-    user = db.get_user(update.effective_user.id)
+    user = await db.get_user(update.effective_user.id)
     current_pincode = user.get("pincode") if user else None
 
     if current_pincode:
-        message = f"""
-📍 *Change Pincode*
-
-Your current pincode: *{current_pincode}*
-
-━━━━━━━━━━━━━━━━━━━━━━
-Enter new 6-digit pincode:
-"""
+        message = PINCODE_PROMPT_CHANGE_TMPL.format(current_pincode)
     else:
-        message = """
-📍 *Set Your Pincode*
+        message = PINCODE_PROMPT_NEW
 
-━━━━━━━━━━━━━━━━━━━━━━
-Enter your 6-digit delivery pincode:
-
-_Example: 400001_
-"""
-
-    keyboard = [[InlineKeyboardButton("❌ Cancel", callback_data="cb_cancel")]]
-    await update.message.reply_text(message, parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(keyboard))
+    await update.message.reply_text(message, parse_mode="Markdown", reply_markup=CANCEL_KB)
 
     # Set state to wait for pincode
     user_id = update.effective_user.id
-    USER_STATES[user_id] = "awaiting_pincode"
-    logger.info(f"Set USER_STATES[{user_id}] = awaiting_pincode")
+    await state_store.set(user_id, "awaiting_pincode")
+    logger.info("Set state for %s = awaiting_pincode", user_id)
 
 
 async def set_pincode_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -164,39 +331,27 @@ async def set_pincode_callback(update: Update, context: ContextTypes.DEFAULT_TYP
     query = update.callback_query
     await query.answer()
 
-    user = db.get_user(query.from_user.id)
+    user = await db.get_user(query.from_user.id)
     current_pincode = user.get("pincode") if user else None
 
     if current_pincode:
-        message = f"""
-📍 *Change Pincode*
-
-Your current pincode: *{current_pincode}*
-
-━━━━━━━━━━━━━━━━━━━━━━
-*Type your new 6-digit pincode:*
-"""
+        message = PINCODE_PROMPT_CHANGE_CB_TMPL.format(current_pincode)
     else:
-        message = """
-📍 *Set Your Pincode*
-
-━━━━━━━━━━━━━━━━━━━━━━
-*Type your 6-digit delivery pincode:*
-
-_Example: 400063_
-"""
-
-    keyboard = [[InlineKeyboardButton("❌ Cancel", callback_data="cb_cancel")]]
+        message = PINCODE_PROMPT_NEW_CB
 
     try:
-        await query.edit_message_text(message, parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(keyboard))
-    except:
-        await query.message.reply_text(message, parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(keyboard))
+        await query.edit_message_text(message, parse_mode="Markdown", reply_markup=CANCEL_KB)
+    except BadRequest as e:
+        # "message is not modified" means the prompt is already on screen -
+        # nothing to do. Other edit failures (e.g. message too old to edit)
+        # fall back to sending a fresh message.
+        if "not modified" not in str(e).lower():
+            await query.message.reply_text(message, parse_mode="Markdown", reply_markup=CANCEL_KB)
 
     # Set state to wait for pincode using global dict
     user_id = query.from_user.id
-    USER_STATES[user_id] = "awaiting_pincode"
-    logger.info(f"Set USER_STATES[{user_id}] = awaiting_pincode (callback)")
+    await state_store.set(user_id, "awaiting_pincode")
+    logger.info("Set state for %s = awaiting_pincode (callback)", user_id)
 
 
 async def process_pincode(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -204,31 +359,27 @@ async def process_pincode(update: Update, context: ContextTypes.DEFAULT_TYPE):
     pincode = update.message.text.strip()
     user_id = update.effective_user.id
 
-    logger.info(f"Processing pincode: {pincode} for user {user_id}")
+    logger.info("Processing pincode: %s for user %s", pincode, user_id)
 
     # Validate pincode format
-    if not pincode.isdigit() or len(pincode) != 6:
-        keyboard = [[InlineKeyboardButton("❌ Cancel", callback_data="cb_cancel")]]
+    if not _PINCODE_RE.match(pincode):
         await update.message.reply_text(
             "⚠️ *Invalid pincode!*\n\nPlease enter a valid 6-digit pincode:",
             parse_mode="Markdown",
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            reply_markup=CANCEL_KB
         )
         return  # Keep awaiting_pincode = True
 
     # Show loading message
-    loading_msg = await update.message.reply_text(
-        "🔍 *Checking pincode...*\n\n⏳ _Please wait, this may take 10-15 seconds..._",
-        parse_mode="Markdown"
-    )
+    loading_msg = await update.message.reply_text(LOADING_PINCODE_MSG, parse_mode="Markdown")
 
     # Clear the awaiting state
-    USER_STATES.pop(user_id, None)
+    await state_store.pop(user_id)
 
     # Search pincode
-    logger.info(f"Searching pincode {pincode}...")
-    pincode_info = amul_api.search_pincode(pincode)
-    logger.info(f"Pincode search result: {pincode_info}")
+    logger.info("Searching pincode %s...", pincode)
+    pincode_info = await _search_pincode_shared(pincode)
+    logger.info("Pincode search result: %s", pincode_info)
 
     if not pincode_info:
         keyboard = [
@@ -245,7 +396,7 @@ async def process_pincode(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # Save to database
-    db.update_user_pincode(
+    await db.update_user_pincode(
         user_id,
         pincode_info["pincode"],
         pincode_info["substore_id"],
@@ -286,11 +437,20 @@ async def cancel_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer("Cancelled")
 
-    USER_STATES.pop(query.from_user.id, None)
+    await state_store.pop(query.from_user.id)
 
-    user = db.get_user(query.from_user.id)
+    user = await db.get_user(query.from_user.id)
     has_pincode = user and user.get("pincode")
 
+    # If the cancel screen is already showing (double tap), only the keyboard
+    # could differ - skip re-sending identical text
+    if query.message and query.message.text == "❌ Cancelled\n\nChoose an option below:":
+        try:
+            await query.edit_message_reply_markup(reply_markup=get_main_menu_keyboard(has_pincode))
+        except BadRequest:
+            pass
+        return
+
     await query.edit_message_text(
         "❌ *Cancelled*\n\nChoose an option below:",
         parse_mode="Markdown",
@@ -300,8 +460,8 @@ async def cancel_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def show_products(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show available products for subscription"""
-    USER_STATES.pop(update.effective_user.id, None)
-    user = db.get_user(update.effective_user.id)
+    await state_store.pop(update.effective_user.id)
+    user = await db.get_user(update.effective_user.id)
 
     if not user or not user.get("pincode"):
         keyboard = [[InlineKeyboardButton("📍 Set Pincode First", callback_data="cb_setpincode")]]
@@ -312,10 +472,7 @@ async def show_products(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    loading_msg = await update.message.reply_text(
-        "🔄 *Loading Products...*\n\n⏳ _Fetching latest stock data..._",
-        parse_mode="Markdown"
-    )
+    loading_msg = await update.message.reply_text(LOADING_PRODUCTS_MSG, parse_mode="Markdown")
 
     await _show_products_list(loading_msg, user, update.effective_user.id, context)
 
@@ -325,8 +482,8 @@ async def show_products_callback(update: Update, context: ContextTypes.DEFAULT_T
     query = update.callback_query
     await query.answer()
 
-    USER_STATES.pop(query.from_user.id, None)
-    user = db.get_user(query.from_user.id)
+    await state_store.pop(query.from_user.id)
+    user = await db.get_user(query.from_user.id)
 
     if not user or not user.get("pincode"):
         keyboard = [[InlineKeyboardButton("📍 Set Pincode First", callback_data="cb_setpincode")]]
@@ -337,44 +494,30 @@ async def show_products_callback(update: Update, context: ContextTypes.DEFAULT_T
         )
         return
 
-    await query.edit_message_text(
-        "🔄 *Loading Products...*\n\n⏳ _Fetching latest stock data..._",
-        parse_mode="Markdown"
-    )
+    await query.edit_message_text(LOADING_PRODUCTS_MSG, parse_mode="Markdown")
 
     await _show_products_list(query, user, query.from_user.id, context, is_callback=True)
 
 
-async def _display_products(msg, user, user_id, products, is_callback, from_cache=False):
+async def _display_products(msg, user, user_id, products, context, is_callback, from_cache=False):
     """Display products list with keyboard"""
-    subscriptions = db.get_user_subscriptions(user_id)
-    subscribed_skus = [s["product_sku"] for s in subscriptions]
-
-    # Create modern keyboard
-    keyboard = []
-    for product in products:
-        is_subscribed = product["sku"] in subscribed_skus
-        is_in_stock = product.get("in_stock", False)
-
-        sub_icon = "✅" if is_subscribed else "⬜"
-        stock_icon = "🟢" if is_in_stock else "🔴"
-
-        name = product['name'][:28]
-        btn_text = f"{sub_icon} {name} {stock_icon}"
-
-        keyboard.append([
-            InlineKeyboardButton(btn_text, callback_data=f"toggle_{product['sku']}")
-        ])
-
-    keyboard.append([
-        InlineKeyboardButton("✅ Save & Continue", callback_data="products_done"),
-        InlineKeyboardButton("🔄 Refresh", callback_data="cb_products")
-    ])
-    keyboard.append([
-        InlineKeyboardButton("🏠 Main Menu", callback_data="cb_start")
-    ])
-
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    subscriptions = await db.get_user_subscriptions(user_id)
+    subscribed_skus = {s["product_sku"] for s in subscriptions}
+    # Keep the set around so toggle taps don't have to re-query it
+    context.user_data["subscribed_skus"] = subscribed_skus
+
+    # Create modern keyboard; keep the rows + row index per SKU so a toggle
+    # tap only has to rebuild the one row that changed
+    rows = [_product_row(p, i, p["sku"] in subscribed_skus) for i, p in enumerate(products)]
+    context.user_data["keyboard_rows"] = rows
+    context.user_data["sku_row_idx"] = {p["sku"]: i for i, p in enumerate(products)}
+    context.user_data["sku_by_idx"] = [p["sku"] for p in products]
+    # products_done summarizes against this; build it once here instead of
+    # rebuilding the dict on every save
+    context.user_data["stock_by_sku"] = {p["sku"]: p for p in products}
+    context.user_data["substore_id"] = user.get("substore_id")
+
+    reply_markup = InlineKeyboardMarkup(rows + PRODUCTS_FOOTER_ROWS)
 
     # Add indicator if showing cached data
     cache_indicator = " 📦" if from_cache else " ✨"
@@ -404,7 +547,7 @@ async def _show_products_list(msg, user, user_id, context, is_callback=False):
     """Helper to show products list"""
     try:
         # INSTANT LOAD: First show cached data from database (fast!)
-        cached_products = db.get_all_products()
+        cached_products = await db.get_all_products()
 
         if cached_products:
             # Convert database format to expected format
@@ -412,6 +555,7 @@ async def _show_products_list(msg, user, user_id, context, is_callback=False):
                 "id": p["product_id"],
                 "sku": p["sku"],
                 "name": p["name"],
+                "display_name": p["name"][:28],
                 "price": p["price"],
                 "image_url": p.get("image_url", ""),
                 "category": p.get("category", ""),
@@ -420,33 +564,30 @@ async def _show_products_list(msg, user, user_id, context, is_callback=False):
             } for p in cached_products]
 
             # Display cached products immediately
-            await _display_products(msg, user, user_id, products, is_callback, from_cache=True)
+            await _display_products(msg, user, user_id, products, context, is_callback, from_cache=True)
 
             # BACKGROUND REFRESH: Now fetch fresh data and update if changed
             try:
-                amul_api.set_pincode(user["pincode"], user["substore_id"])
-                fresh_products = amul_api.get_protein_products(user["substore_id"])
+                fresh_products = await _fetch_products_shared(user["pincode"], user["substore_id"])
 
                 if fresh_products:
-                    # Update database with fresh data
+                    # Slice display names once here rather than on every redraw
                     for p in fresh_products:
-                        db.upsert_product(
-                            p["id"], p["sku"], p["name"],
-                            p.get("price", 0), p.get("image_url", ""),
-                            p.get("category", ""),
-                            p.get("in_stock", False), p.get("quantity", 0)
-                        )
+                        p["display_name"] = p["name"][:28]
+
+                    # Update database with fresh data (single batched transaction)
+                    await db.upsert_products_bulk(fresh_products)
 
                     # Update display with fresh data
-                    await _display_products(msg, user, user_id, fresh_products, is_callback, from_cache=False)
+                    await _display_products(msg, user, user_id, fresh_products, context, is_callback, from_cache=False)
                     context.user_data["products_cache"] = fresh_products
+                    _SHARED_PRODUCTS[user["substore_id"]] = (time.monotonic(), fresh_products)
             except Exception as refresh_error:
-                logger.warning(f"Background refresh failed (showing cached): {refresh_error}")
+                logger.warning("Background refresh failed (showing cached): %s", refresh_error)
                 # Keep showing cached data - user already has something to work with
         else:
             # No cache - must fetch from API (first time user)
-            amul_api.set_pincode(user["pincode"], user["substore_id"])
-            products = amul_api.get_protein_products(user["substore_id"])
+            products = await _fetch_products_shared(user["pincode"], user["substore_id"])
 
             if not products:
                 keyboard = [
@@ -467,19 +608,18 @@ async def _show_products_list(msg, user, user_id, context, is_callback=False):
                     )
                 return
 
-            # Save products to database
             for p in products:
-                db.upsert_product(
-                    p["id"], p["sku"], p["name"],
-                    p.get("price", 0), p.get("image_url", ""),
-                    p.get("category", ""),
-                    p.get("in_stock", False), p.get("quantity", 0)
-                )
+                p["display_name"] = p["name"][:28]
+
+            # Save products to database (single batched transaction)
+            await db.upsert_products_bulk(products)
 
-            await _display_products(msg, user, user_id, products, is_callback, from_cache=False)
+            await _display_products(msg, user, user_id, products, context, is_callback, from_cache=False)
+            context.user_data["products_cache"] = products
+            _SHARED_PRODUCTS[user["substore_id"]] = (time.monotonic(), products)
 
     except Exception as e:
-        logger.error(f"Error showing products: {e}")
+        logger.error("Error showing products: %s", e)
         keyboard = [
             [InlineKeyboardButton("🔄 Retry", callback_data="cb_products")],
             [InlineKeyboardButton("🏠 Main Menu", callback_data="cb_start")]
@@ -494,16 +634,30 @@ async def _show_products_list(msg, user, user_id, context, is_callback=False):
 async def handle_product_toggle(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle product subscription toggle"""
     query = update.callback_query
-    await query.answer("Updating...", show_alert=False)
-
     data = query.data
 
+    # A callback query can only be answered once, so the stale-keyboard
+    # check runs before the plain ack - otherwise the toast is silently
+    # dropped and a dead keyboard gives no feedback at all
+    if data.startswith("t_"):
+        idx = int(data[2:])
+        if idx >= len(context.user_data.get("sku_by_idx", [])):
+            # Keyboard from a previous session; user needs a fresh list
+            await query.answer("List outdated - tap 🔄 Refresh", show_alert=False)
+            return
+
+    # Plain ack - no toast text to render/transmit on every tap
+    await query.answer()
+
     if data == "products_done":
-        subscriptions = db.get_user_subscriptions(query.from_user.id)
+        subscriptions = await db.get_user_subscriptions(query.from_user.id)
 
         if subscriptions:
-            cached_products = context.user_data.get("products_cache", [])
-            stock_by_sku = {p["sku"]: p for p in cached_products}
+            stock_by_sku = context.user_data.get("stock_by_sku")
+            if stock_by_sku is None:
+                # Stale context (e.g. bot restart) - rebuild from the cache
+                cached_products = context.user_data.get("products_cache", [])
+                stock_by_sku = {p["sku"]: p for p in cached_products}
 
             in_stock_items = []
             out_stock_items = []
@@ -519,26 +673,27 @@ async def handle_product_toggle(update: Update, context: ContextTypes.DEFAULT_TY
                 else:
                     out_stock_items.append(f"🔴 {name}")
 
-            message = """
+            parts = ["""
 ╔══════════════════════════════════╗
       ✅ *SUBSCRIPTIONS SAVED*
 ╚══════════════════════════════════╝
 
-"""
+"""]
             if in_stock_items:
-                message += "*🟢 In Stock Now:*\n"
-                message += "\n".join(in_stock_items) + "\n\n"
+                parts.append("*🟢 In Stock Now:*\n")
+                parts.append("\n".join(in_stock_items) + "\n\n")
 
             if out_stock_items:
-                message += "*🔴 Out of Stock:*\n"
-                message += "\n".join(out_stock_items) + "\n\n"
+                parts.append("*🔴 Out of Stock:*\n")
+                parts.append("\n".join(out_stock_items) + "\n\n")
 
-            message += f"""━━━━━━━━━━━━━━━━━━━━━━
+            parts.append(f"""━━━━━━━━━━━━━━━━━━━━━━
 🔔 *Tracking {len(subscriptions)} product(s)*
 
 ⚡ I'll check every 30 seconds
 📲 You'll get instant alerts!
-"""
+""")
+            message = "".join(parts)
 
             keyboard = [
                 [
@@ -561,52 +716,57 @@ async def handle_product_toggle(update: Update, context: ContextTypes.DEFAULT_TY
             )
         return
 
-    if data.startswith("toggle_"):
-        sku = data.replace("toggle_", "")
+    if data.startswith("t_") or data.startswith("toggle_"):
+        if data.startswith("t_"):
+            # Index already validated above, before the ack
+            sku = context.user_data["sku_by_idx"][int(data[2:])]
+        else:
+            # Legacy keyboards still in chats carry the full SKU
+            sku = data.replace("toggle_", "")
         user_id = query.from_user.id
-        user = db.get_user(user_id)
 
         if "products_cache" not in context.user_data:
-            context.user_data["products_cache"] = db.get_all_products()
+            # Prefer the catalog another user in the same substore already
+            # fetched; fall back to the DB only when that's missing too
+            shared = _SHARED_PRODUCTS.get(context.user_data.get("substore_id"))
+            if shared is not None and time.monotonic() - shared[0] < SHARED_PRODUCTS_TTL:
+                context.user_data["products_cache"] = shared[1]
+            else:
+                context.user_data["products_cache"] = await db.get_all_products()
 
         cached_products = context.user_data["products_cache"]
-        subscriptions = db.get_user_subscriptions(user_id)
-        subscribed_skus = [s["product_sku"] for s in subscriptions]
+
+        # Reuse the set stashed by _display_products; fall back to one query
+        subscribed_skus = context.user_data.get("subscribed_skus")
+        if subscribed_skus is None:
+            subscribed_skus = {s["product_sku"] for s in await db.get_user_subscriptions(user_id)}
+            context.user_data["subscribed_skus"] = subscribed_skus
 
         # Toggle subscription
         if sku in subscribed_skus:
-            db.remove_subscription(user_id, sku)
-            subscribed_skus.remove(sku)
+            await db.remove_subscription(user_id, sku)
+            subscribed_skus.discard(sku)
         else:
-            db.add_subscription(user_id, sku)
-            db.set_user_active(user_id, True)
-            subscribed_skus.append(sku)
-
-        # Rebuild keyboard
-        keyboard = []
-        for product in cached_products:
-            is_subscribed = product["sku"] in subscribed_skus
-            is_in_stock = product.get("in_stock", False)
-
-            sub_icon = "✅" if is_subscribed else "⬜"
-            stock_icon = "🟢" if is_in_stock else "🔴"
-
-            name = product['name'][:28]
-            btn_text = f"{sub_icon} {name} {stock_icon}"
-
-            keyboard.append([
-                InlineKeyboardButton(btn_text, callback_data=f"toggle_{product['sku']}")
-            ])
-
-        keyboard.append([
-            InlineKeyboardButton("✅ Save & Continue", callback_data="products_done"),
-            InlineKeyboardButton("🔄 Refresh", callback_data="cb_products")
-        ])
-        keyboard.append([
-            InlineKeyboardButton("🏠 Main Menu", callback_data="cb_start")
-        ])
+            await db.add_subscription(user_id, sku)
+            await db.set_user_active(user_id, True)
+            subscribed_skus.add(sku)
+
+        # Flip just the toggled row when we still have the rows from
+        # _display_products; otherwise rebuild the whole keyboard
+        rows = context.user_data.get("keyboard_rows")
+        row_idx = context.user_data.get("sku_row_idx", {}).get(sku)
+
+        if rows is not None and row_idx is not None:
+            product = next((p for p in cached_products if p["sku"] == sku), None)
+            if product is not None:
+                rows[row_idx] = _product_row(product, row_idx, sku in subscribed_skus)
+        else:
+            rows = [_product_row(p, i, p["sku"] in subscribed_skus) for i, p in enumerate(cached_products)]
+            context.user_data["keyboard_rows"] = rows
+            context.user_data["sku_row_idx"] = {p["sku"]: i for i, p in enumerate(cached_products)}
+            context.user_data["sku_by_idx"] = [p["sku"] for p in cached_products]
 
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = InlineKeyboardMarkup(rows + PRODUCTS_FOOTER_ROWS)
 
         try:
             await query.edit_message_reply_markup(reply_markup=reply_markup)
@@ -616,7 +776,7 @@ async def handle_product_toggle(update: Update, context: ContextTypes.DEFAULT_TY
 
 async def my_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show user's current status"""
-    USER_STATES.pop(update.effective_user.id, None)
+    await state_store.pop(update.effective_user.id)
     await _show_status(update.message, update.effective_user.id)
 
 
@@ -624,13 +784,13 @@ async def my_status_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     """Show status from callback"""
     query = update.callback_query
     await query.answer()
-    USER_STATES.pop(query.from_user.id, None)
+    await state_store.pop(query.from_user.id)
     await _show_status(query, query.from_user.id, is_callback=True)
 
 
 async def _show_status(msg, user_id, is_callback=False):
     """Helper to show status"""
-    user = db.get_user(user_id)
+    user = await db.get_user(user_id)
 
     if not user:
         keyboard = [[InlineKeyboardButton("🚀 Get Started", callback_data="cb_start")]]
@@ -641,7 +801,7 @@ async def _show_status(msg, user_id, is_callback=False):
             await msg.reply_text(text, parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(keyboard))
         return
 
-    subscriptions = db.get_user_subscriptions(user_id)
+    subscriptions = await db.get_user_subscriptions(user_id)
 
     status_icon = "✅ Active" if user.get('is_active') else "⏸️ Paused"
 
@@ -661,17 +821,19 @@ async def _show_status(msg, user_id, is_callback=False):
 *🛒 Tracked Products ({len(subscriptions)}):*
 """
 
+    parts = [status_text]
     if subscriptions:
         for i, sub in enumerate(subscriptions, 1):
             name = sub.get('name', sub.get('product_name', 'Unknown'))[:30]
             price = sub.get('price', 'N/A')
-            status_text += f"│ {i}. {name}\n│    ₹{price}\n"
+            parts.append(f"│ {i}. {name}\n│    ₹{price}\n")
     else:
-        status_text += "│ _No products selected_\n"
+        parts.append("│ _No products selected_\n")
 
-    status_text += """
+    parts.append("""
 ━━━━━━━━━━━━━━━━━━━━━━
-"""
+""")
+    status_text = "".join(parts)
 
     keyboard = [
         [
@@ -689,30 +851,100 @@ async def _show_status(msg, user_id, is_callback=False):
 
 async def check_instock(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Check what's currently in stock"""
-    USER_STATES.pop(update.effective_user.id, None)
-    loading_msg = await update.message.reply_text(
-        "📦 *Checking Stock...*\n\n⏳ _Fetching live data..._",
-        parse_mode="Markdown"
-    )
+    await state_store.pop(update.effective_user.id)
+    loading_msg = await update.message.reply_text(LOADING_STOCK_MSG, parse_mode="Markdown")
     await _check_stock(loading_msg, update.effective_user.id, context)
 
 
 async def check_instock_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Check stock from callback"""
     query = update.callback_query
-    await query.answer()
-    USER_STATES.pop(query.from_user.id, None)
+    # The answer toast is free - no extra message edit round trip just to
+    # show a loading screen that gets replaced moments later
+    await query.answer("⏳ Checking stock...")
+    await state_store.pop(query.from_user.id)
 
-    await query.edit_message_text(
-        "📦 *Checking Stock...*\n\n⏳ _Fetching live data..._",
-        parse_mode="Markdown"
-    )
     await _check_stock(query, query.from_user.id, context, is_callback=True)
 
 
+# Items per page of the in-stock report; keeps each message well under
+# Telegram's 4096-char limit no matter how large the catalog grows
+STOCK_PAGE_SIZE = 6
+
+
+def _render_stock_page(user, products, page):
+    """Render one page of the in-stock report; returns (text, reply_markup)"""
+    total_pages = (len(products) + STOCK_PAGE_SIZE - 1) // STOCK_PAGE_SIZE
+    page = max(0, min(page, total_pages - 1))
+    chunk = products[page * STOCK_PAGE_SIZE:(page + 1) * STOCK_PAGE_SIZE]
+
+    page_note = f"  _(page {page + 1}/{total_pages})_" if total_pages > 1 else ""
+    header = f"""
+╔══════════════════════════════════╗
+         📦 *STOCK STATUS*
+╚══════════════════════════════════╝
+
+📍 Pincode: *{user['pincode']}*
+
+━━━━━━━━━━━━━━━━━━━━━━
+🟢 *{len(products)} Product(s) In Stock:*{page_note}
+━━━━━━━━━━━━━━━━━━━━━━
+
+"""
+    message = header + "".join(f"""┌─────────────────────────────
+│ *{p['name'][:30]}*
+│ 💰 ₹{p['price']} │ 📦 Qty: {p['quantity']}
+│ 🛒 [Order Now]({p['product_url']})
+└─────────────────────────────
+
+""" for p in chunk)
+
+    keyboard = []
+    nav_row = []
+    if page > 0:
+        nav_row.append(InlineKeyboardButton("◀️ Prev", callback_data="cb_instock_prev"))
+    if page < total_pages - 1:
+        nav_row.append(InlineKeyboardButton("Next ▶️", callback_data="cb_instock_next"))
+    if nav_row:
+        keyboard.append(nav_row)
+    keyboard.append([
+        InlineKeyboardButton("🔄 Refresh", callback_data="cb_instock"),
+        InlineKeyboardButton("🛒 Track", callback_data="cb_products")
+    ])
+    keyboard.append([InlineKeyboardButton("🏠 Main Menu", callback_data="cb_start")])
+
+    return message, InlineKeyboardMarkup(keyboard)
+
+
+async def stock_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Flip between pages of the in-stock report using the cached list"""
+    query = update.callback_query
+    await query.answer()
+
+    products = context.user_data.get("stock_products")
+    if not products:
+        # Cache gone (e.g. bot restart) - run a fresh stock check instead
+        await query.edit_message_text(LOADING_STOCK_MSG, parse_mode="Markdown")
+        await _check_stock(query, query.from_user.id, context, is_callback=True)
+        return
+
+    user = await db.get_user(query.from_user.id)
+    page = context.user_data.get("stock_page", 0)
+    page += 1 if query.data == "cb_instock_next" else -1
+    total_pages = (len(products) + STOCK_PAGE_SIZE - 1) // STOCK_PAGE_SIZE
+    page = max(0, min(page, total_pages - 1))
+    context.user_data["stock_page"] = page
+
+    message, reply_markup = _render_stock_page(user, products, page)
+    try:
+        await query.edit_message_text(message, parse_mode="Markdown", disable_web_page_preview=True, reply_markup=reply_markup)
+    except BadRequest:
+        pass  # already on this page
+
+
 async def _check_stock(msg, user_id, context, is_callback=False):
     """Helper to check stock"""
-    user = db.get_user(user_id)
+    user = await db.get_user(user_id)
 
     if not user or not user.get("pincode"):
         keyboard = [[InlineKeyboardButton("📍 Set Pincode", callback_data="cb_setpincode")]]
@@ -724,18 +956,17 @@ async def _check_stock(msg, user_id, context, is_callback=False):
         return
 
     try:
-        amul_api.set_pincode(user["pincode"], user["substore_id"])
-        products = amul_api.get_in_stock_products(user["substore_id"])
-
-        keyboard = [
-            [
-                InlineKeyboardButton("🔄 Refresh", callback_data="cb_instock"),
-                InlineKeyboardButton("🛒 Track", callback_data="cb_products")
-            ],
-            [InlineKeyboardButton("🏠 Main Menu", callback_data="cb_start")]
-        ]
+        products = await _fetch_products_shared(user["pincode"], user["substore_id"])
+        products = [p for p in products if p.get("in_stock", False)]
 
         if not products:
+            keyboard = [
+                [
+                    InlineKeyboardButton("🔄 Refresh", callback_data="cb_instock"),
+                    InlineKeyboardButton("🛒 Track", callback_data="cb_products")
+                ],
+                [InlineKeyboardButton("🏠 Main Menu", callback_data="cb_start")]
+            ]
             text = f"""
 ╔══════════════════════════════════╗
          📦 *STOCK STATUS*
@@ -751,39 +982,38 @@ instantly when they're available.
 ━━━━━━━━━━━━━━━━━━━━━━
 """
             if is_callback:
-                await msg.edit_message_text(text, parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(keyboard))
+                try:
+                    await msg.edit_message_text(text, parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(keyboard))
+                except BadRequest as e:
+                    # Refresh with unchanged stock repaints the same report;
+                    # Telegram rejects the identical edit, which is fine
+                    if "not modified" not in str(e).lower():
+                        raise
             else:
                 await msg.edit_text(text, parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(keyboard))
             return
 
-        message = f"""
-╔══════════════════════════════════╗
-         📦 *STOCK STATUS*
-╚══════════════════════════════════╝
+        # Remember the list so the pagination buttons can flip pages without
+        # hitting the Amul API again
+        context.user_data["stock_products"] = products
+        context.user_data["stock_page"] = 0
 
-📍 Pincode: *{user['pincode']}*
-
-━━━━━━━━━━━━━━━━━━━━━━
-🟢 *{len(products)} Product(s) In Stock:*
-━━━━━━━━━━━━━━━━━━━━━━
-
-"""
-        for p in products:
-            message += f"""┌─────────────────────────────
-│ *{p['name'][:30]}*
-│ 💰 ₹{p['price']} │ 📦 Qty: {p['quantity']}
-│ 🛒 [Order Now]({p['product_url']})
-└─────────────────────────────
-
-"""
+        message, reply_markup = _render_stock_page(user, products, 0)
 
         if is_callback:
-            await msg.edit_message_text(message, parse_mode="Markdown", disable_web_page_preview=True, reply_markup=InlineKeyboardMarkup(keyboard))
+            try:
+                await msg.edit_message_text(message, parse_mode="Markdown", disable_web_page_preview=True, reply_markup=reply_markup)
+            except BadRequest as e:
+                # Common case on 🔄 Refresh: stock unchanged (guaranteed
+                # within the scraper's cache TTL), so the edit is identical
+                # and Telegram rejects it - not a fetch failure
+                if "not modified" not in str(e).lower():
+                    raise
         else:
-            await msg.edit_text(message, parse_mode="Markdown", disable_web_page_preview=True, reply_markup=InlineKeyboardMarkup(keyboard))
+            await msg.edit_text(message, parse_mode="Markdown", disable_web_page_preview=True, reply_markup=reply_markup)
 
     except Exception as e:
-        logger.error(f"Stock check error: {e}")
+        logger.error("Stock check error: %s", e)
         keyboard = [
             [InlineKeyboardButton("🔄 Retry", callback_data="cb_instock")],
             [InlineKeyboardButton("🏠 Main Menu", callback_data="cb_start")]
@@ -797,41 +1027,17 @@ instantly when they're available.
 
 async def stop_notifications(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Stop all notifications"""
-    USER_STATES.pop(update.effective_user.id, None)
-    keyboard = [
-        [
-            InlineKeyboardButton("✅ Yes, Stop All", callback_data="confirm_stop"),
-            InlineKeyboardButton("❌ No, Keep", callback_data="cancel_stop")
-        ]
-    ]
-    await update.message.reply_text(
-        "⚠️ *Stop Notifications?*\n\n"
-        "This will unsubscribe you from all product alerts.\n\n"
-        "Are you sure?",
-        parse_mode="Markdown",
-        reply_markup=InlineKeyboardMarkup(keyboard)
-    )
+    await state_store.pop(update.effective_user.id)
+    await update.message.reply_text(STOP_CONFIRM_MSG, parse_mode="Markdown", reply_markup=STOP_CONFIRM_KB)
 
 
 async def stop_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Stop from callback"""
     query = update.callback_query
     await query.answer()
-    USER_STATES.pop(query.from_user.id, None)
+    await state_store.pop(query.from_user.id)
 
-    keyboard = [
-        [
-            InlineKeyboardButton("✅ Yes, Stop", callback_data="confirm_stop"),
-            InlineKeyboardButton("❌ No, Keep", callback_data="cancel_stop")
-        ]
-    ]
-    await query.edit_message_text(
-        "⚠️ *Stop Notifications?*\n\n"
-        "This will unsubscribe you from all product alerts.\n\n"
-        "Are you sure?",
-        parse_mode="Markdown",
-        reply_markup=InlineKeyboardMarkup(keyboard)
-    )
+    await query.edit_message_text(STOP_CONFIRM_MSG, parse_mode="Markdown", reply_markup=STOP_CONFIRM_KB)
 
 
 async def handle_stop_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -840,8 +1046,8 @@ async def handle_stop_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE
     await query.answer()
 
     if query.data == "confirm_stop":
-        db.clear_user_subscriptions(query.from_user.id)
-        db.set_user_active(query.from_user.id, False)
+        await db.clear_user_subscriptions(query.from_user.id)
+        await db.set_user_active(query.from_user.id, False)
 
         keyboard = [[InlineKeyboardButton("🚀 Start Again", callback_data="cb_start")]]
         await query.edit_message_text(
@@ -852,7 +1058,7 @@ async def handle_stop_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE
             reply_markup=InlineKeyboardMarkup(keyboard)
         )
     else:
-        user = db.get_user(query.from_user.id)
+        user = await db.get_user(query.from_user.id)
         has_pincode = user and user.get("pincode")
         await query.edit_message_text(
             "✅ *Notifications Active*\n\n"
@@ -866,9 +1072,9 @@ async def handle_start_callback(update: Update, context: ContextTypes.DEFAULT_TY
     """Handle main menu callback"""
     query = update.callback_query
     await query.answer()
-    USER_STATES.pop(query.from_user.id, None)
+    await state_store.pop(query.from_user.id)
 
-    user = db.get_user(query.from_user.id)
+    user = await db.get_user(query.from_user.id)
     has_pincode = user and user.get("pincode")
 
     welcome = f"""
@@ -881,6 +1087,18 @@ async def handle_start_callback(update: Update, context: ContextTypes.DEFAULT_TY
         welcome += f"📍 Pincode: *{user['pincode']}*\n\n"
     welcome += "👇 *Choose an option:*"
 
+    # Menu already on screen with the same pincode? Only refresh the keyboard
+    # instead of paying the full text edit (which Telegram would reject as
+    # "message is not modified" anyway).
+    current = query.message.text if query.message else None
+    if current and "AMUL PROTEIN ALERTS" in current and "Choose an option:" in current \
+            and (not has_pincode or user["pincode"] in current):
+        try:
+            await query.edit_message_reply_markup(reply_markup=get_main_menu_keyboard(has_pincode))
+        except BadRequest:
+            pass
+        return
+
     await query.edit_message_text(
         welcome,
         parse_mode="Markdown",
@@ -892,28 +1110,13 @@ async def handle_help_callback(update: Update, context: ContextTypes.DEFAULT_TYP
     """Handle help callback"""
     query = update.callback_query
     await query.answer()
-    USER_STATES.pop(query.from_user.id, None)
+    await state_store.pop(query.from_user.id)
 
-    user = db.get_user(query.from_user.id)
+    user = await db.get_user(query.from_user.id)
     has_pincode = user and user.get("pincode")
 
-    help_text = """
-╔══════════════════════════════════╗
-          ❓ *HELP CENTER*
-╚══════════════════════════════════╝
-
-*🔹 How It Works:*
-1️⃣ Set your pincode
-2️⃣ Choose products to track
-3️⃣ I check stock every 30 sec
-4️⃣ Get notified when available!
-
-*🔹 Tips:*
-• Tap buttons for quick actions
-• You can track multiple products
-"""
     await query.edit_message_text(
-        help_text,
+        HELP_TEXT_SHORT,
         parse_mode="Markdown",
         reply_markup=get_main_menu_keyboard(has_pincode)
     )
@@ -924,17 +1127,17 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
     user_id = update.effective_user.id
     text = update.message.text.strip()
 
-    current_state = USER_STATES.get(user_id)
-    logger.info(f"Received text '{text}' from user {user_id}, state={current_state}, USER_STATES={USER_STATES}")
+    current_state = await state_store.get(user_id)
+    logger.info("Received text %r from user %s, state=%s", text, user_id, current_state)
 
     # Check if we're waiting for a pincode
     if current_state == "awaiting_pincode":
-        logger.info(f"Processing as pincode input for user {user_id}")
+        logger.info("Processing as pincode input for user %s", user_id)
         await process_pincode(update, context)
         return
 
     # Default response - show menu
-    user = db.get_user(user_id)
+    user = await db.get_user(user_id)
     has_pincode = user and user.get("pincode")
 
     await update.message.reply_text(
@@ -944,6 +1147,38 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
     )
 
 
+# Exact-match callback routes, resolved in O(1) by dispatch_callback. Toggle
+# taps carry a per-product suffix and keep their own handler.
+_CB_ROUTES = {
+    "cb_setpincode": set_pincode_callback,
+    "cb_cancel": cancel_callback,
+    "cb_products": show_products_callback,
+    "cb_mystatus": my_status_callback,
+    "cb_instock": check_instock_callback,
+    "cb_instock_next": stock_page_callback,
+    "cb_instock_prev": stock_page_callback,
+    "cb_stop": stop_callback,
+    "cb_start": handle_start_callback,
+    "cb_help": handle_help_callback,
+    "products_done": handle_product_toggle,
+    "confirm_stop": handle_stop_confirm,
+    "cancel_stop": handle_stop_confirm,
+}
+
+_CB_ROUTED_RE = re.compile(r"^(cb_\w+|products_done|confirm_stop|cancel_stop)$")
+_CB_TOGGLE_RE = re.compile(r"^(t_\d+|toggle_.+)$")
+
+
+async def dispatch_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Route exact-match callback data through _CB_ROUTES"""
+    handler = _CB_ROUTES.get(update.callback_query.data)
+    if handler is not None:
+        await handler(update, context)
+    else:
+        # Unknown cb_* button (e.g. from an old bot version) - just ack it
+        await update.callback_query.answer()
+
+
 def setup_handlers(application: Application):
     """Set up all bot handlers"""
 
@@ -957,17 +1192,11 @@ def setup_handlers(application: Application):
     application.add_handler(CommandHandler("stop", stop_notifications))
     application.add_handler(CommandHandler("cancel", lambda u, c: cancel_callback(u, c)))
 
-    # Callback query handlers - ORDER MATTERS!
-    application.add_handler(CallbackQueryHandler(set_pincode_callback, pattern="^cb_setpincode$"))
-    application.add_handler(CallbackQueryHandler(cancel_callback, pattern="^cb_cancel$"))
-    application.add_handler(CallbackQueryHandler(show_products_callback, pattern="^cb_products$"))
-    application.add_handler(CallbackQueryHandler(my_status_callback, pattern="^cb_mystatus$"))
-    application.add_handler(CallbackQueryHandler(check_instock_callback, pattern="^cb_instock$"))
-    application.add_handler(CallbackQueryHandler(stop_callback, pattern="^cb_stop$"))
-    application.add_handler(CallbackQueryHandler(handle_start_callback, pattern="^cb_start$"))
-    application.add_handler(CallbackQueryHandler(handle_help_callback, pattern="^cb_help$"))
-    application.add_handler(CallbackQueryHandler(handle_product_toggle, pattern="^toggle_|^products_done$"))
-    application.add_handler(CallbackQueryHandler(handle_stop_confirm, pattern="^confirm_stop$|^cancel_stop$"))
+    # Callback query handlers - one dict-dispatched handler for the fixed
+    # buttons plus one for toggle taps, instead of a linear scan over ten
+    # per-pattern handlers on every update
+    application.add_handler(CallbackQueryHandler(dispatch_callback, pattern=_CB_ROUTED_RE))
+    application.add_handler(CallbackQueryHandler(handle_product_toggle, pattern=_CB_TOGGLE_RE))
 
     # Text message handler - MUST BE LAST
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_message))
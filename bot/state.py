@@ -0,0 +1,73 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+import config
+
+logger = logging.getLogger(__name__)
+
+# How long an "awaiting_pincode"-style state may sit unused before it expires.
+# Stops abandoned flows from leaking memory / Redis keys forever.
+STATE_TTL = 600
+
+# Hard cap on tracked users. The TTL only removes an expired entry when that
+# user comes back, so users who start a flow once and never return would
+# otherwise accumulate for the process lifetime.
+MAX_TRACKED_USERS = 10000
+
+
+class MemoryStateStore:
+    """In-process state store - default for single-instance deployments"""
+
+    def __init__(self):
+        # user_id -> (expires_at, state), oldest-set first; evicting from
+        # the front drops the stalest flow when the cap is hit
+        self._states = OrderedDict()
+
+    async def get(self, user_id: int) -> Optional[str]:
+        entry = self._states.get(user_id)
+        if entry is None:
+            return None
+        expires_at, state = entry
+        if time.monotonic() >= expires_at:
+            del self._states[user_id]
+            return None
+        return state
+
+    async def set(self, user_id: int, state: str, ttl: int = STATE_TTL):
+        self._states[user_id] = (time.monotonic() + ttl, state)
+        self._states.move_to_end(user_id)
+        if len(self._states) > MAX_TRACKED_USERS:
+            self._states.popitem(last=False)
+
+    async def pop(self, user_id: int):
+        self._states.pop(user_id, None)
+
+
+class RedisStateStore:
+    """Redis-backed state store so multiple bot processes share user state"""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self._redis = redis.from_url(url, decode_responses=True)
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"state:{user_id}"
+
+    async def get(self, user_id: int) -> Optional[str]:
+        return await self._redis.get(self._key(user_id))
+
+    async def set(self, user_id: int, state: str, ttl: int = STATE_TTL):
+        await self._redis.set(self._key(user_id), state, ex=ttl)
+
+    async def pop(self, user_id: int):
+        await self._redis.delete(self._key(user_id))
+
+
+def create_state_store():
+    """Create the configured state store (Redis if REDIS_URL is set)"""
+    if config.REDIS_URL:
+        logger.info("Using Redis state store")
+        return RedisStateStore(config.REDIS_URL)
+    return MemoryStateStore()
@@ -6,6 +6,9 @@ load_dotenv()
 # Telegram Bot Configuration
 BOT_TOKEN = os.getenv("BOT_TOKEN", "")
 
+# Optional Redis for shared user state when running multiple bot processes
+REDIS_URL = os.getenv("REDIS_URL", "")
+
 # Amul API Configuration
 AMUL_BASE_URL = "https://shop.amul.com"
 AMUL_PROTEIN_URL = f"{AMUL_BASE_URL}/en/browse/protein"
@@ -1,265 +1,529 @@
-import sqlite3
+import asyncio
+from itertools import count
 from typing import Optional
-from contextlib import contextmanager
+import aiosqlite
 import config
 
+# Per-call suffix for get_changed_skus' temp tables; concurrent substore
+# checks interleave on the shared connection, so they can't share one table
+_tmp_stock_seq = count()
+
 
 class Database:
+    """Async SQLite wrapper (aiosqlite) with a single long-lived connection.
+
+    Every method is a coroutine so handlers never block the event loop on
+    DB I/O. The connection is opened lazily on first use and shared; aiosqlite
+    serializes statements on its own worker thread, so sharing is safe.
+    """
+
     def __init__(self, db_path: str = config.DATABASE_PATH):
         self.db_path = db_path
-        self.init_db()
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._conn_lock = asyncio.Lock()
 
-    @contextmanager
-    def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        try:
-            yield conn
-        finally:
-            conn.close()
+    async def _connection(self) -> aiosqlite.Connection:
+        """Get the shared connection, opening and initializing it on first use"""
+        if self._conn is None:
+            async with self._conn_lock:
+                if self._conn is None:
+                    # cached_statements above the default 128: the monitor
+                    # cycles through enough distinct statements that evicting
+                    # and re-preparing them every cycle is avoidable
+                    conn = await aiosqlite.connect(self.db_path, cached_statements=256)
+                    conn.row_factory = aiosqlite.Row
+                    # WAL lets reads proceed while the monitor writes
+                    await conn.execute("PRAGMA journal_mode=WAL")
+                    await conn.execute("PRAGMA synchronous=NORMAL")
+                    await conn.execute("PRAGMA temp_store=MEMORY")
+                    await conn.execute("PRAGMA mmap_size=268435456")
+                    await conn.execute("PRAGMA cache_size=-20000")
+                    # Wait out short write locks instead of failing with
+                    # "database is locked" when a checkpoint runs
+                    await conn.execute("PRAGMA busy_timeout=5000")
+                    await conn.execute("PRAGMA wal_autocheckpoint=1000")
+                    # Takes effect on fresh DBs (set before the first table);
+                    # lets pruned alert pages be reclaimed incrementally
+                    await conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                    await self._init_db(conn)
+                    self._conn = conn
+        return self._conn
+
+    async def maintain(self):
+        """Periodic maintenance: refresh planner stats and truncate the WAL.
 
-    def init_db(self):
+        Meant to be called every so often from the stock monitor's loop so
+        the WAL file stays bounded under the write-heavy check cycle.
+        """
+        conn = await self._connection()
+        await self.prune_stock_alerts()
+        await conn.execute("PRAGMA optimize")
+        await conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    async def prune_stock_alerts(self, days: int = 30):
+        """Drop alert history older than the retention window.
+
+        stock_alerts is append-only; without pruning, get_last_alert walks an
+        ever-deeper index. Freed pages are handed back via incremental vacuum.
+        """
+        conn = await self._connection()
+        await conn.execute(
+            "DELETE FROM stock_alerts WHERE notified_at < datetime('now', ?)",
+            (f"-{days} days",)
+        )
+        await conn.execute("PRAGMA incremental_vacuum(1000)")
+        await conn.commit()
+
+    async def close(self):
+        """Close the shared connection"""
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    async def _init_db(self, conn: aiosqlite.Connection):
         """Initialize database tables"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-
-            # Users table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id INTEGER PRIMARY KEY,
-                    username TEXT,
-                    first_name TEXT,
-                    pincode TEXT,
-                    substore_id TEXT,
-                    substore_name TEXT,
-                    is_active INTEGER DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+        # Users table
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                user_id INTEGER PRIMARY KEY,
+                username TEXT,
+                first_name TEXT,
+                pincode TEXT,
+                substore_id TEXT,
+                substore_name TEXT,
+                is_active INTEGER DEFAULT 1,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
 
-            # Products table (cache of available products)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS products (
-                    product_id TEXT PRIMARY KEY,
-                    sku TEXT UNIQUE,
-                    name TEXT,
-                    price REAL,
-                    image_url TEXT,
-                    category TEXT,
-                    in_stock INTEGER DEFAULT 0,
-                    quantity INTEGER DEFAULT 0,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+        # Products table (cache of available products)
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS products (
+                product_id TEXT PRIMARY KEY,
+                sku TEXT UNIQUE,
+                name TEXT,
+                price REAL,
+                image_url TEXT,
+                category TEXT,
+                in_stock INTEGER DEFAULT 0,
+                quantity INTEGER DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
 
-            # User subscriptions (which products user wants to track)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS subscriptions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    product_sku TEXT,
-                    is_active INTEGER DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(user_id),
-                    UNIQUE(user_id, product_sku)
-                )
-            """)
+        # User subscriptions (which products user wants to track)
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS subscriptions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                product_sku TEXT,
+                is_active INTEGER DEFAULT 1,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(user_id),
+                UNIQUE(user_id, product_sku)
+            )
+        """)
 
-            # Stock alerts (to track what was notified)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS stock_alerts (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    product_sku TEXT,
-                    quantity INTEGER,
-                    notified_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(user_id)
-                )
-            """)
+        # Stock alerts (to track what was notified)
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS stock_alerts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                product_sku TEXT,
+                quantity INTEGER,
+                notified_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(user_id)
+            )
+        """)
+
+        # Per-user stock baseline the monitor diffs against; persisted so a
+        # restart doesn't re-suppress alerts for everything already tracked
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS user_stock_state (
+                user_id INTEGER,
+                sku TEXT,
+                in_stock INTEGER,
+                quantity INTEGER,
+                PRIMARY KEY (user_id, sku)
+            )
+        """)
 
-            conn.commit()
+        # Composite indexes matching the hot query shapes; the singles they
+        # replace are dropped so old DBs don't carry both
+        await conn.execute("DROP INDEX IF EXISTS idx_subscriptions_sku")
+        await conn.execute("DROP INDEX IF EXISTS idx_stock_alerts_user_sku")
+        await conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_subs_sku_active ON subscriptions(product_sku, is_active)"
+        )
+        await conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_subs_user_active ON subscriptions(user_id, is_active)"
+        )
+        await conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_alerts_user_sku_time"
+            " ON stock_alerts(user_id, product_sku, notified_at DESC)"
+        )
+        # Covers the monitor's "active users ordered by substore" scan
+        await conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_users_active_substore
+            ON users(is_active, substore_id)
+            WHERE is_active = 1 AND pincode IS NOT NULL
+        """)
+
+        # Refresh planner statistics so the new indexes actually get used
+        await conn.execute("ANALYZE")
+
+        await conn.commit()
 
     # User operations
-    def add_user(self, user_id: int, username: str = None, first_name: str = None) -> bool:
+    async def add_user(self, user_id: int, username: str = None, first_name: str = None) -> bool:
         """Add a new user or update existing"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO users (user_id, username, first_name)
-                VALUES (?, ?, ?)
-                ON CONFLICT(user_id) DO UPDATE SET
-                    username = excluded.username,
-                    first_name = excluded.first_name,
-                    updated_at = CURRENT_TIMESTAMP
-            """, (user_id, username, first_name))
-            conn.commit()
-            return True
+        conn = await self._connection()
+        await conn.execute("""
+            INSERT INTO users (user_id, username, first_name)
+            VALUES (?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                username = excluded.username,
+                first_name = excluded.first_name,
+                updated_at = CURRENT_TIMESTAMP
+        """, (user_id, username, first_name))
+        await conn.commit()
+        return True
 
-    def get_user(self, user_id: int) -> Optional[dict]:
+    async def get_user(self, user_id: int) -> Optional[dict]:
         """Get user by ID"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
-            row = cursor.fetchone()
-            return dict(row) if row else None
+        conn = await self._connection()
+        cursor = await conn.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
+        row = await cursor.fetchone()
+        return dict(row) if row else None
 
-    def get_user_by_id(self, user_id: int) -> Optional[dict]:
+    async def get_user_by_id(self, user_id: int) -> Optional[dict]:
         """Retrieve user details by user ID."""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
-            row = cursor.fetchone()
-            return dict(row) if row else None
+        return await self.get_user(user_id)
 
-    def update_user_pincode(self, user_id: int, pincode: str, substore_id: str, substore_name: str) -> bool:
+    async def update_user_pincode(self, user_id: int, pincode: str, substore_id: str, substore_name: str) -> bool:
         """Update user's pincode and substore"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE users
-                SET pincode = ?, substore_id = ?, substore_name = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE user_id = ?
-            """, (pincode, substore_id, substore_name, user_id))
-            conn.commit()
-            return cursor.rowcount > 0
-
-    def set_user_active(self, user_id: int, is_active: bool) -> bool:
+        conn = await self._connection()
+        cursor = await conn.execute("""
+            UPDATE users
+            SET pincode = ?, substore_id = ?, substore_name = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE user_id = ?
+        """, (pincode, substore_id, substore_name, user_id))
+        await conn.commit()
+        return cursor.rowcount > 0
+
+    async def set_user_active(self, user_id: int, is_active: bool) -> bool:
         """Activate or deactivate user"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE users SET is_active = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE user_id = ?
-            """, (1 if is_active else 0, user_id))
-            conn.commit()
-            return cursor.rowcount > 0
-
-    def get_active_users(self) -> list:
+        conn = await self._connection()
+        cursor = await conn.execute("""
+            UPDATE users SET is_active = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE user_id = ?
+        """, (1 if is_active else 0, user_id))
+        await conn.commit()
+        return cursor.rowcount > 0
+
+    async def deactivate_users(self, user_ids: list) -> bool:
+        """Deactivate many users with a single UPDATE"""
+        if not user_ids:
+            return True
+        placeholders = ",".join("?" * len(user_ids))
+        conn = await self._connection()
+        await conn.execute(
+            f"UPDATE users SET is_active = 0, updated_at = CURRENT_TIMESTAMP"
+            f" WHERE user_id IN ({placeholders})",
+            user_ids
+        )
+        await conn.commit()
+        return True
+
+    async def get_active_users(self) -> list:
         """Get all active users with pincode set"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM users
-                WHERE is_active = 1 AND pincode IS NOT NULL
-            """)
-            return [dict(row) for row in cursor.fetchall()]
+        conn = await self._connection()
+        cursor = await conn.execute("""
+            SELECT * FROM users
+            WHERE is_active = 1 AND pincode IS NOT NULL
+        """)
+        rows = await cursor.fetchall()
+        return [dict(row) for row in rows]
+
+    async def get_active_users_by_substore(self) -> list:
+        """Get active users with pincode set, ordered by substore.
+
+        The ordering lets the stock monitor group users per substore with
+        itertools.groupby instead of bucketing in Python.
+        """
+        conn = await self._connection()
+        cursor = await conn.execute("""
+            SELECT * FROM users
+            WHERE is_active = 1 AND pincode IS NOT NULL AND substore_id IS NOT NULL
+            ORDER BY substore_id
+        """)
+        rows = await cursor.fetchall()
+        return [dict(row) for row in rows]
 
     # Product operations
-    def upsert_product(self, product_id: str, sku: str, name: str, price: float,
-                       image_url: str = None, category: str = None, in_stock: bool = False, quantity: int = 0) -> bool:
+    async def upsert_product(self, product_id: str, sku: str, name: str, price: float,
+                             image_url: str = None, category: str = None, in_stock: bool = False, quantity: int = 0) -> bool:
         """Insert or update a product"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO products (product_id, sku, name, price, image_url, category, in_stock, quantity)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(product_id) DO UPDATE SET
-                    name = excluded.name,
-                    price = excluded.price,
-                    image_url = excluded.image_url,
-                    category = excluded.category,
-                    in_stock = excluded.in_stock,
-                    quantity = excluded.quantity,
-                    updated_at = CURRENT_TIMESTAMP
-            """, (product_id, sku, name, price, image_url, category, 1 if in_stock else 0, quantity))
-            conn.commit()
+        conn = await self._connection()
+        await conn.execute("""
+            INSERT INTO products (product_id, sku, name, price, image_url, category, in_stock, quantity)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(product_id) DO UPDATE SET
+                name = excluded.name,
+                price = excluded.price,
+                image_url = excluded.image_url,
+                category = excluded.category,
+                in_stock = excluded.in_stock,
+                quantity = excluded.quantity,
+                updated_at = CURRENT_TIMESTAMP
+        """, (product_id, sku, name, price, image_url, category, 1 if in_stock else 0, quantity))
+        await conn.commit()
+        return True
+
+    async def upsert_products_bulk(self, products: list) -> bool:
+        """Insert or update many products in one transaction.
+
+        Accepts dicts in the scraper's product format; one executemany
+        replaces N separate round-trips when refreshing the catalog.
+        """
+        if not products:
             return True
+        rows = [
+            (
+                p["id"], p["sku"], p["name"],
+                p.get("price", 0), p.get("image_url", ""), p.get("category", ""),
+                1 if p.get("in_stock", False) else 0, p.get("quantity", 0)
+            )
+            for p in products
+        ]
+        conn = await self._connection()
+        await conn.executemany("""
+            INSERT INTO products (product_id, sku, name, price, image_url, category, in_stock, quantity)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(product_id) DO UPDATE SET
+                name = excluded.name,
+                price = excluded.price,
+                image_url = excluded.image_url,
+                category = excluded.category,
+                in_stock = excluded.in_stock,
+                quantity = excluded.quantity,
+                updated_at = CURRENT_TIMESTAMP
+        """, rows)
+        await conn.commit()
+        return True
+
+    async def get_changed_skus(self, products: list) -> set:
+        """Diff fresh scrape results against the stored products in SQL.
 
-    def get_all_products(self) -> list:
+        Returns the SKUs whose stored row differs from the fresh scrape
+        (plus SKUs not seen before). Run this before upsert_products_bulk
+        overwrites the old values; in the common nothing-changed cycle the
+        monitor can then skip both the write and the per-user loop.
+        """
+        if not products:
+            return set()
+        conn = await self._connection()
+        # Unique table per call: concurrent substore checks interleave at
+        # the awaits, and a shared table would let one check diff against
+        # another's rows
+        table = f"tmp_stock_{next(_tmp_stock_seq)}"
+        await conn.execute(f"""
+            CREATE TEMP TABLE {table} (
+                sku TEXT PRIMARY KEY,
+                name TEXT,
+                price REAL,
+                in_stock INTEGER,
+                quantity INTEGER
+            )
+        """)
+        try:
+            await conn.executemany(
+                f"INSERT OR REPLACE INTO {table} (sku, name, price, in_stock, quantity)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        p["sku"], p["name"], p.get("price", 0),
+                        1 if p.get("in_stock", False) else 0, p.get("quantity", 0)
+                    )
+                    for p in products
+                ]
+            )
+            cursor = await conn.execute(f"""
+                SELECT t.sku FROM {table} t
+                LEFT JOIN products p ON p.sku = t.sku
+                WHERE p.sku IS NULL OR p.in_stock <> t.in_stock OR p.quantity <> t.quantity
+                   OR p.name <> t.name OR p.price <> t.price
+            """)
+            rows = await cursor.fetchall()
+            return {row["sku"] for row in rows}
+        finally:
+            await conn.execute(f"DROP TABLE IF EXISTS {table}")
+
+    async def get_all_products(self) -> list:
         """Get all cached products"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM products ORDER BY name")
-            return [dict(row) for row in cursor.fetchall()]
+        conn = await self._connection()
+        cursor = await conn.execute("SELECT * FROM products ORDER BY name")
+        rows = await cursor.fetchall()
+        return [dict(row) for row in rows]
 
-    def get_product_by_sku(self, sku: str) -> Optional[dict]:
+    async def get_product_by_sku(self, sku: str) -> Optional[dict]:
         """Get product by SKU"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM products WHERE sku = ?", (sku,))
-            row = cursor.fetchone()
-            return dict(row) if row else None
+        conn = await self._connection()
+        cursor = await conn.execute("SELECT * FROM products WHERE sku = ?", (sku,))
+        row = await cursor.fetchone()
+        return dict(row) if row else None
 
     # Subscription operations
-    def add_subscription(self, user_id: int, product_sku: str) -> bool:
+    async def add_subscription(self, user_id: int, product_sku: str) -> bool:
         """Subscribe user to a product"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO subscriptions (user_id, product_sku, is_active)
-                VALUES (?, ?, 1)
-                ON CONFLICT(user_id, product_sku) DO UPDATE SET
-                    is_active = 1
-            """, (user_id, product_sku))
-            conn.commit()
-            return True
+        conn = await self._connection()
+        await conn.execute("""
+            INSERT INTO subscriptions (user_id, product_sku, is_active)
+            VALUES (?, ?, 1)
+            ON CONFLICT(user_id, product_sku) DO UPDATE SET
+                is_active = 1
+        """, (user_id, product_sku))
+        await conn.commit()
+        return True
 
-    def remove_subscription(self, user_id: int, product_sku: str) -> bool:
+    async def remove_subscription(self, user_id: int, product_sku: str) -> bool:
         """Unsubscribe user from a product"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE subscriptions SET is_active = 0
-                WHERE user_id = ? AND product_sku = ?
-            """, (user_id, product_sku))
-            conn.commit()
-            return cursor.rowcount > 0
-
-    def get_user_subscriptions(self, user_id: int) -> list:
+        conn = await self._connection()
+        cursor = await conn.execute("""
+            UPDATE subscriptions SET is_active = 0
+            WHERE user_id = ? AND product_sku = ?
+        """, (user_id, product_sku))
+        await conn.commit()
+        return cursor.rowcount > 0
+
+    async def get_user_subscriptions(self, user_id: int) -> list:
         """Get all active subscriptions for a user"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT s.*, p.name, p.price, p.image_url
-                FROM subscriptions s
-                LEFT JOIN products p ON s.product_sku = p.sku
-                WHERE s.user_id = ? AND s.is_active = 1
-            """, (user_id,))
-            return [dict(row) for row in cursor.fetchall()]
-
-    def get_subscribers_for_product(self, product_sku: str) -> list:
+        conn = await self._connection()
+        cursor = await conn.execute("""
+            SELECT s.*, p.name, p.price, p.image_url
+            FROM subscriptions s
+            LEFT JOIN products p ON s.product_sku = p.sku
+            WHERE s.user_id = ? AND s.is_active = 1
+        """, (user_id,))
+        rows = await cursor.fetchall()
+        return [dict(row) for row in rows]
+
+    async def get_subscriptions_for_users(self, user_ids: list) -> dict:
+        """Get active subscriptions for many users in one query.
+
+        Returns {user_id: [subscription dict, ...]} so the stock monitor can
+        cover a whole substore without a round-trip per user.
+        """
+        if not user_ids:
+            return {}
+        placeholders = ",".join("?" * len(user_ids))
+        conn = await self._connection()
+        cursor = await conn.execute(f"""
+            SELECT s.*, p.name, p.price, p.image_url
+            FROM subscriptions s
+            LEFT JOIN products p ON s.product_sku = p.sku
+            WHERE s.is_active = 1 AND s.user_id IN ({placeholders})
+        """, user_ids)
+        rows = await cursor.fetchall()
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(row["user_id"], []).append(dict(row))
+        return grouped
+
+    async def get_subscribers_for_product(self, product_sku: str) -> list:
         """Get all active users subscribed to a product"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT u.* FROM users u
-                JOIN subscriptions s ON u.user_id = s.user_id
-                WHERE s.product_sku = ? AND s.is_active = 1 AND u.is_active = 1
-            """, (product_sku,))
-            return [dict(row) for row in cursor.fetchall()]
-
-    def clear_user_subscriptions(self, user_id: int) -> bool:
+        conn = await self._connection()
+        cursor = await conn.execute("""
+            SELECT u.* FROM users u
+            JOIN subscriptions s ON u.user_id = s.user_id
+            WHERE s.product_sku = ? AND s.is_active = 1 AND u.is_active = 1
+        """, (product_sku,))
+        rows = await cursor.fetchall()
+        return [dict(row) for row in rows]
+
+    async def clear_user_subscriptions(self, user_id: int) -> bool:
         """Remove all subscriptions for a user"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE subscriptions SET is_active = 0
-                WHERE user_id = ?
-            """, (user_id,))
-            conn.commit()
-            return True
+        conn = await self._connection()
+        await conn.execute("""
+            UPDATE subscriptions SET is_active = 0
+            WHERE user_id = ?
+        """, (user_id,))
+        await conn.commit()
+        return True
 
     # Stock alert operations
-    def add_stock_alert(self, user_id: int, product_sku: str, quantity: int) -> bool:
+    async def add_stock_alert(self, user_id: int, product_sku: str, quantity: int) -> bool:
         """Record a stock alert sent"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO stock_alerts (user_id, product_sku, quantity)
-                VALUES (?, ?, ?)
-            """, (user_id, product_sku, quantity))
-            conn.commit()
+        conn = await self._connection()
+        await conn.execute("""
+            INSERT INTO stock_alerts (user_id, product_sku, quantity)
+            VALUES (?, ?, ?)
+        """, (user_id, product_sku, quantity))
+        await conn.commit()
+        return True
+
+    async def get_user_stock_states(self, user_ids: list) -> dict:
+        """Get the stored stock baseline for many users in one query.
+
+        Returns {(user_id, sku): {"in_stock": bool, "quantity": int}}.
+        """
+        if not user_ids:
+            return {}
+        placeholders = ",".join("?" * len(user_ids))
+        conn = await self._connection()
+        cursor = await conn.execute(
+            f"SELECT user_id, sku, in_stock, quantity FROM user_stock_state"
+            f" WHERE user_id IN ({placeholders})",
+            user_ids
+        )
+        rows = await cursor.fetchall()
+        return {
+            (row["user_id"], row["sku"]): {
+                "in_stock": bool(row["in_stock"]),
+                "quantity": row["quantity"]
+            }
+            for row in rows
+        }
+
+    async def upsert_user_stock_states_bulk(self, rows: list) -> bool:
+        """Write many (user_id, sku, in_stock, quantity) baselines at once"""
+        if not rows:
+            return True
+        conn = await self._connection()
+        await conn.executemany("""
+            INSERT INTO user_stock_state (user_id, sku, in_stock, quantity)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id, sku) DO UPDATE SET
+                in_stock = excluded.in_stock,
+                quantity = excluded.quantity
+        """, rows)
+        await conn.commit()
+        return True
+
+    async def add_stock_alerts_bulk(self, rows: list) -> bool:
+        """Record many sent alerts in one transaction.
+
+        rows are (user_id, product_sku, quantity) tuples collected during a
+        monitor cycle.
+        """
+        if not rows:
             return True
+        conn = await self._connection()
+        await conn.executemany("""
+            INSERT INTO stock_alerts (user_id, product_sku, quantity)
+            VALUES (?, ?, ?)
+        """, rows)
+        await conn.commit()
+        return True
 
-    def get_last_alert(self, user_id: int, product_sku: str) -> Optional[dict]:
+    async def get_last_alert(self, user_id: int, product_sku: str) -> Optional[dict]:
         """Get last alert for user and product"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM stock_alerts
-                WHERE user_id = ? AND product_sku = ?
-                ORDER BY notified_at DESC LIMIT 1
-            """, (user_id, product_sku))
-            row = cursor.fetchone()
-            return dict(row) if row else None
+        conn = await self._connection()
+        cursor = await conn.execute("""
+            SELECT * FROM stock_alerts
+            WHERE user_id = ? AND product_sku = ?
+            ORDER BY notified_at DESC LIMIT 1
+        """, (user_id, product_sku))
+        row = await cursor.fetchone()
+        return dict(row) if row else None
@@ -1,6 +1,7 @@
 import asyncio
 import logging
 from telegram.ext import Application
+from telegram.request import HTTPXRequest
 import config
 from bot import setup_handlers
 from scheduler import StockMonitor
@@ -40,10 +41,18 @@ def main():
         print("See .env.example for reference.")
         return
 
-    # Create application
+    # Create application. HTTP/2 multiplexes concurrent sends (stock alerts
+    # fan out to many users) over one connection; the larger pool and
+    # pool_timeout absorb notification bursts without raising TimedOut.
     application = (
         Application.builder()
         .token(config.BOT_TOKEN)
+        .request(HTTPXRequest(
+            connection_pool_size=32,
+            http_version="2",
+            read_timeout=20,
+            pool_timeout=10,
+        ))
         .post_init(post_init)
         .post_shutdown(post_shutdown)
         .build()
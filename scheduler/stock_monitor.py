@@ -1,11 +1,23 @@
 import asyncio
-from datetime import datetime
+import logging
+import time
+from itertools import groupby
+from operator import itemgetter
 from telegram import Bot
 from telegram.error import TelegramError
 from database import Database
 from scraper import AmulAPI
 import config
 
+# How many substores may be scraped at once; bounds outbound load on the
+# Amul site while still overlapping the network waits
+SUBSTORE_CONCURRENCY = 4
+
+logger = logging.getLogger(__name__)
+
+# Run DB maintenance (PRAGMA optimize + WAL truncate) every N check cycles
+DB_MAINTENANCE_CYCLES = 120
+
 
 class StockMonitor:
     """Background stock monitoring service"""
@@ -13,20 +25,45 @@ class StockMonitor:
     def __init__(self, bot: Bot):
         self.bot = bot
         self.db = Database()
+        # One AmulAPI for all substores so the pincode/product caches and the
+        # pooled HTTP session are shared across cycles. It keeps the current
+        # pincode as instance state, so scrapes take a lock; notification
+        # fan-out still runs in parallel.
+        self.amul_api = AmulAPI()
+        self.amul_api.init_session()
+        # Launch the browser while the bot is still starting up so the
+        # first poll cycle doesn't pay for it
+        self.amul_api.prewarm()
+        self._scrape_lock = asyncio.Lock()
         self.running = False
-        # Cache for tracking stock state per user
-        self._stock_cache = {}  # {(user_id, sku): {"in_stock": bool, "quantity": int}}
+        # Alerts sent this cycle, flushed to the DB in one transaction once
+        # every substore task has finished (safe to share: the flush in
+        # check_all_stocks runs strictly after the gather)
+        self._pending_alerts = []  # [(user_id, sku, quantity), ...]
+        # Rendered message bodies per (sku, type, change), cleared each cycle;
+        # only the pincode differs between subscribers of the same product
+        self._template_cache = {}
+        # Users who blocked the bot this cycle, deactivated in one UPDATE
+        self._blocked_user_ids = set()
 
     async def start(self):
         """Start the stock monitoring loop"""
         self.running = True
-        print(f"Stock monitor started. Checking every {config.STOCK_CHECK_INTERVAL} minutes.")
+        logger.info("Stock monitor started. Checking every %s minutes.", config.STOCK_CHECK_INTERVAL)
 
+        cycle = 0
         while self.running:
             try:
                 await self.check_all_stocks()
             except Exception as e:
-                print(f"Stock check error: {e}")
+                logger.error("Stock check error: %s", e)
+
+            cycle += 1
+            if cycle % DB_MAINTENANCE_CYCLES == 0:
+                try:
+                    await self.db.maintain()
+                except Exception as e:
+                    logger.error("DB maintenance error: %s", e)
 
             # Wait for next interval
             await asyncio.sleep(config.STOCK_CHECK_INTERVAL * 60)
@@ -34,71 +71,98 @@ class StockMonitor:
     def stop(self):
         """Stop the stock monitoring loop"""
         self.running = False
-        print("Stock monitor stopped.")
+        self.amul_api.close()
+        logger.info("Stock monitor stopped.")
 
     async def check_all_stocks(self):
         """Check stock for all active users"""
-        print(f"[{datetime.now()}] Running stock check...")
+        t0 = time.monotonic()
+        logger.info("Running stock check...")
 
-        # Get all active users with pincode
-        active_users = self.db.get_active_users()
+        # Message bodies are only valid for one cycle's product data
+        self._template_cache.clear()
+
+        # The poll interval elapsing is the "stock may have moved" signal:
+        # drop cached product lists so this cycle scrapes fresh data, while
+        # reads between cycles keep hitting the cache
+        self.amul_api.invalidate()
+
+        # Get all active users with pincode, already ordered by substore so
+        # groupby can bucket them without building an intermediate dict
+        active_users = await self.db.get_active_users_by_substore()
 
         if not active_users:
-            print("No active users to check.")
+            logger.info("No active users to check.")
             return
 
-        # Group users by substore to minimize API calls
-        substore_users = {}
-        for user in active_users:
-            substore_id = user.get("substore_id")
-            if substore_id:
-                if substore_id not in substore_users:
-                    substore_users[substore_id] = []
-                substore_users[substore_id].append(user)
-
-        # Check each substore
-        for substore_id, users in substore_users.items():
-            try:
-                await self._check_substore_stock(substore_id, users)
-                # Small delay between substores to avoid rate limiting
-                await asyncio.sleep(2)
-            except Exception as e:
-                print(f"Error checking substore {substore_id}: {e}")
+        # Check substores concurrently; the semaphore replaces the old
+        # fixed 2s sleep between them as the rate limiter
+        semaphore = asyncio.Semaphore(SUBSTORE_CONCURRENCY)
 
-    async def _check_substore_stock(self, substore_id: str, users: list):
-        """Check stock for a specific substore"""
-        amul_api = AmulAPI()
-        amul_api.init_session()
+        async def check_one(substore_id, users):
+            async with semaphore:
+                try:
+                    await self._check_substore_stock(substore_id, users)
+                except Exception as e:
+                    logger.error("Error checking substore %s: %s", substore_id, e)
+
+        await asyncio.gather(*(
+            check_one(substore_id, list(users_iter))
+            for substore_id, users_iter in groupby(active_users, key=itemgetter("substore_id"))
+        ))
+
+        # Flush this cycle's alert records in one transaction
+        if self._pending_alerts:
+            await self.db.add_stock_alerts_bulk(self._pending_alerts)
+            self._pending_alerts = []
 
-        # Use the first user's pincode to fetch products
-        amul_api.pincode = users[0].get("pincode")
+        # Deactivate everyone who blocked the bot this cycle in one UPDATE
+        if self._blocked_user_ids:
+            await self.db.deactivate_users(list(self._blocked_user_ids))
+            self._blocked_user_ids = set()
 
-        # Get all products for this substore
-        products = amul_api.get_protein_products(substore_id)
+        logger.info("Stock check finished in %.1fs", time.monotonic() - t0)
+
+    async def _check_substore_stock(self, substore_id: str, users: list):
+        """Check stock for a specific substore"""
+        # Get all products for this substore (scrape runs in a worker thread
+        # so the bot keeps answering users while we wait on the network)
+        async with self._scrape_lock:
+            # Use the first user's pincode to fetch products; reset the
+            # canonical pincode left over from the previous substore
+            self.amul_api.pincode = users[0].get("pincode")
+            self.amul_api.canonical_pincode = None
+            products = await asyncio.to_thread(self.amul_api.get_protein_products, substore_id)
 
         if not products:
-            print(f"No products fetched for substore {substore_id}")
+            logger.warning("No products fetched for substore %s", substore_id)
             return
 
-        # Update database cache with fresh stock data
-        for p in products:
-            self.db.upsert_product(
-                p["id"],
-                p["sku"],
-                p["name"],
-                p.get("price", 0),
-                p.get("image_url", ""),
-                p.get("category", ""),
-                p.get("in_stock", False),
-                p.get("quantity", 0)
+        # Diff against the previous snapshot in SQL, then write only the
+        # rows that actually changed - usually none
+        changed_skus = await self.db.get_changed_skus(products)
+        if changed_skus:
+            await self.db.upsert_products_bulk(
+                [p for p in products if p["sku"] in changed_skus]
             )
 
         # Create lookup by SKU
         stock_by_sku = {p["sku"]: p for p in products}
 
-        # Check each user's subscriptions
+        # One query each covers every user in the substore
+        user_ids = [user["user_id"] for user in users]
+        subs_by_user = await self.db.get_subscriptions_for_users(user_ids)
+        states = await self.db.get_user_stock_states(user_ids)
+
+        # Check each user's subscriptions; sends are independent network
+        # calls, so fan them out instead of awaiting one at a time.
+        # Baselines collect in a local list - substore tasks run
+        # concurrently, and a shared instance list would let one task's
+        # flush race another's appends and drop them
+        pending_states = []  # [(user_id, sku, in_stock, quantity), ...]
+        updates = []
         for user in users:
-            subscriptions = self.db.get_user_subscriptions(user["user_id"])
+            subscriptions = subs_by_user.get(user["user_id"])
 
             if not subscriptions:
                 continue
@@ -108,45 +172,55 @@ class StockMonitor:
                 product = stock_by_sku.get(sku)
 
                 if not product:
-                    print(f"Product {sku} not found in latest stock for substore {substore_id}")
+                    logger.debug("Product %s not found in latest stock for substore %s", sku, substore_id)
                     continue
 
-                await self._process_stock_update(user, product)
+                # Nothing moved relative to THIS user's own baseline - skip
+                # the per-user bookkeeping entirely. changed_skus can't gate
+                # this: the products table isn't keyed by substore, so with
+                # users in several substores the diff runs against whichever
+                # region scraped last and would suppress real transitions.
+                prev_state = states.get((user["user_id"], sku))
+                if (
+                    prev_state is not None
+                    and bool(prev_state["in_stock"]) == bool(product["in_stock"])
+                    and prev_state["quantity"] == product["quantity"]
+                ):
+                    continue
+
+                updates.append(
+                    self._process_stock_update(user, product, prev_state, pending_states)
+                )
+
+        if updates:
+            await asyncio.gather(*updates)
+
+        # Persist the new baselines for this substore in one transaction
+        if pending_states:
+            await self.db.upsert_user_stock_states_bulk(pending_states)
 
-    async def _process_stock_update(self, user: dict, product: dict):
+    async def _process_stock_update(self, user: dict, product: dict,
+                                    prev_state: dict, pending_states: list):
         """Process stock update and send notification if needed"""
         user_id = user["user_id"]
         sku = product["sku"]
-        cache_key = (user_id, sku)
 
         current_in_stock = product["in_stock"]
         current_quantity = product["quantity"]
 
-        # First time seeing this product for this user - initialize cache
-        if cache_key not in self._stock_cache:
-            self._stock_cache[cache_key] = {
-                "in_stock": current_in_stock,
-                "quantity": current_quantity,
-                "initialized": True
-            }
+        # Queue the new baseline; flushed in bulk per substore
+        pending_states.append((user_id, sku, 1 if current_in_stock else 0, current_quantity))
 
+        # First time seeing this product for this user - baseline only
+        if prev_state is None:
             # DON'T send alert on first check - user just subscribed
             # They already know the current stock status from the UI
             # We only alert on CHANGES from this baseline
             return
 
-        # Get previous state from cache
-        prev_state = self._stock_cache[cache_key]
         prev_in_stock = prev_state["in_stock"]
         prev_quantity = prev_state["quantity"]
 
-        # Update cache
-        self._stock_cache[cache_key] = {
-            "in_stock": current_in_stock,
-            "quantity": current_quantity,
-            "initialized": True
-        }
-
         # Determine if we should notify (ONLY on actual state changes)
         should_notify = False
         notification_type = None
@@ -178,16 +252,28 @@ class StockMonitor:
         if should_notify:
             await self._send_notification(user, product, notification_type, quantity_change)
 
-    async def _send_notification(self, user: dict, product: dict, notification_type: str, quantity_change: int = 0):
-        """Send stock notification to user"""
-        user_id = user["user_id"]
-
+    def _notification_template(self, product: dict, notification_type: str, quantity_change: int = 0):
+        """Build (or reuse) the message body for a product transition.
+
+        Everything except the subscriber's pincode is identical across the
+        fan-out, so the body is rendered once per (sku, type, change) with a
+        {pincode} placeholder.
+        """
+        cache_key = (product["sku"], notification_type, quantity_change)
+        template = self._template_cache.get(cache_key)
+        if template is None:
+            template = self._build_notification_body(product, notification_type, quantity_change)
+            self._template_cache[cache_key] = template
+        return template
+
+    def _build_notification_body(self, product: dict, notification_type: str, quantity_change: int = 0):
+        """Render the Markdown body with a {pincode} placeholder"""
         if notification_type == "back_in_stock":
-            message = (
+            return (
                 f"🟢 *STOCK ALERT!*\n\n"
                 f"*{product['name']}*\n"
                 f"is now available!\n\n"
-                f"📍 Pincode: {user['pincode']}\n"
+                "📍 Pincode: {pincode}\n"
                 f"📦 Quantity: {product['quantity']} units\n"
                 f"💰 Price: ₹{product['price']}\n\n"
                 f"🛒 [Order Now]({product['product_url']})\n\n"
@@ -195,45 +281,55 @@ class StockMonitor:
             )
         elif notification_type == "stock_increased":
             change_text = f"+{quantity_change}" if quantity_change > 0 else str(quantity_change)
-            message = (
+            return (
                 f"📦 *STOCK UPDATE*\n\n"
                 f"*{product['name']}*\n"
                 f"Stock increased! ({change_text})\n\n"
-                f"📍 Pincode: {user['pincode']}\n"
+                "📍 Pincode: {pincode}\n"
                 f"📦 Quantity: {product['quantity']} units\n"
                 f"💰 Price: ₹{product['price']}\n\n"
                 f"🛒 [Order Now]({product['product_url']})"
             )
         elif notification_type == "stock_decreased":
-            message = (
+            return (
                 f"📉 *STOCK DECREASED*\n\n"
                 f"*{product['name']}*\n"
                 f"Stock reduced ({quantity_change})\n\n"
-                f"📍 Pincode: {user['pincode']}\n"
+                "📍 Pincode: {pincode}\n"
                 f"📦 Remaining: {product['quantity']} units\n"
                 f"💰 Price: ₹{product['price']}\n\n"
                 f"🛒 [Order Now]({product['product_url']})"
             )
         elif notification_type == "low_stock":
-            message = (
+            return (
                 f"⚠️ *LOW STOCK WARNING*\n\n"
                 f"*{product['name']}*\n"
                 f"Only {product['quantity']} left!\n\n"
-                f"📍 Pincode: {user['pincode']}\n"
+                "📍 Pincode: {pincode}\n"
                 f"💰 Price: ₹{product['price']}\n\n"
                 f"🛒 [Order Now]({product['product_url']})\n\n"
                 f"_Order soon before it's gone!_"
             )
         elif notification_type == "sold_out":
-            message = (
+            return (
                 f"🔴 *SOLD OUT*\n\n"
                 f"*{product['name']}*\n"
                 f"is now out of stock.\n\n"
-                f"📍 Pincode: {user['pincode']}\n\n"
+                "📍 Pincode: {pincode}\n\n"
                 f"_I'll notify you when it's back!_"
             )
         else:
+            return None
+
+    async def _send_notification(self, user: dict, product: dict, notification_type: str, quantity_change: int = 0):
+        """Send stock notification to user"""
+        user_id = user["user_id"]
+
+        template = self._notification_template(product, notification_type, quantity_change)
+        if template is None:
             return
+        # replace() rather than str.format: product names may contain braces
+        message = template.replace("{pincode}", str(user.get("pincode", "")))
 
         try:
             await self.bot.send_message(
@@ -243,12 +339,12 @@ class StockMonitor:
                 disable_web_page_preview=True
             )
 
-            # Record the alert
-            self.db.add_stock_alert(user_id, product["sku"], product["quantity"])
-            print(f"Notification sent to {user_id} for {product['sku']} ({notification_type})")
+            # Record the alert; flushed in bulk at the end of the cycle
+            self._pending_alerts.append((user_id, product["sku"], product["quantity"]))
+            logger.info("Notification sent to %s for %s (%s)", user_id, product["sku"], notification_type)
 
         except TelegramError as e:
-            print(f"Failed to send notification to {user_id}: {e}")
-            # If user blocked the bot, deactivate them
+            logger.warning("Failed to send notification to %s: %s", user_id, e)
+            # If user blocked the bot, deactivate them (batched per cycle)
             if "blocked" in str(e).lower():
-                self.db.set_user_active(user_id, False)
+                self._blocked_user_ids.add(user_id)
@@ -1,13 +1,128 @@
 import json
 import logging
+import os
+import sys
+import types
 import asyncio
+import functools
+import sqlite3
+from bisect import bisect_right
+from collections import OrderedDict
+import threading
+import time
 from typing import Optional, List
+from urllib.parse import urlparse, parse_qsl, urlencode
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from playwright.async_api import async_playwright
 import config
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 
+def _json_loads(data):
+    """Parse JSON bytes, via orjson when installed (2-5x faster than stdlib)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# Pincode -> substore mapping is effectively static, so cache hits for a day;
+# failed lookups are cached too (shorter) so repeated bad pincodes don't
+# trigger a 10-15s scrape every time.
+PINCODE_CACHE_TTL = 86400
+PINCODE_NEGATIVE_TTL = 3600
+
+# Product lists are shared by every user on the same substore; a TTL just
+# under the 30s polling cadence collapses their bursts into one scrape
+# without ever serving data older than one polling cycle.
+PRODUCTS_CACHE_TTL = 25
+
+# Max browser contexts (one per in-flight fetch) open at once on the
+# shared browser; bounds memory without launching extra Chromiums
+CONTEXT_POOL_SIZE = 4
+
+# Resource types the scraper never needs; aborting them shrinks every page
+# load (the pincode/products XHRs fire without any of these)
+BLOCKED_RESOURCE_TYPES = {"image", "font", "stylesheet", "media"}
+
+# Analytics/tracker hosts aborted regardless of resource type (their
+# payloads come in as scripts/XHRs, which the type filter lets through)
+BLOCKED_HOSTS = (
+    "googletagmanager.com",
+    "google-analytics.com",
+    "facebook.net",
+    "doubleclick.net",
+    "clarity.ms",
+)
+
+# Browser cookies saved per pincode so warm starts skip the pincode modal
+STORAGE_STATE_DIR = ".cache"
+
+# Candidate selectors for the pincode input and its suggestion dropdown,
+# joined with ',' so Playwright races them in one DOM subscription instead
+# of polling each serially
+PIN_INPUT_SELECTOR = (
+    'input[type="tel"], input[placeholder*="pincode" i], '
+    'input[name*="pincode" i], input[id*="pincode" i], '
+    'input[class*="pincode" i]'
+)
+_DROPDOWN_SELECTOR_TMPL = (
+    'li:has-text("{p}"), [role="option"]:has-text("{p}"), '
+    'div[class*="option"]:has-text("{p}"), .dropdown-item:has-text("{p}")'
+)
+
+# Bound once; the base URL never changes at runtime
+_PRODUCT_URL_PREFIX = config.AMUL_BASE_URL + "/en/product/"
+
+# Cap on per-pincode cache entries; a long-running bot would otherwise
+# accumulate every pincode ever queried
+CACHE_MAX_ENTRIES = 256
+
+# Browser-resolved pincode mappings persist here so restarts don't pay a
+# Chromium scrape for pincodes already resolved; the mapping is effectively
+# static, hence the long TTL
+PINCODE_DB_PATH = "amul_cache.db"
+PINCODE_PERSIST_TTL = 30 * 86400
+
+# Last product payload per pincode, persisted so a restarted bot can show
+# products before its first scrape. Only covers the restart window: the
+# monitor's invalidate() wipes these rows at the top of every cycle, and a
+# running process never rereads a pincode it has fetched in-memory.
+PRODUCTS_PERSIST_TTL = 3600
+
+# Bump when the shape of persisted rows changes (new fields, different
+# payload layout); readers ignore rows written under another version, so a
+# format change never surfaces as a half-parsed cache hit
+CACHE_SCHEMA = 1
+
+
+class _LRUCache(OrderedDict):
+    """Small dict with an entry cap; least recently used is evicted first"""
+
+    def __init__(self, maxsize):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def get(self, key, default=None):
+        try:
+            self.move_to_end(key)
+        except KeyError:
+            return default
+        return self[key]
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
 # Substore ID mapping from open-source project
 SUBSTORE_IDS = {
     'goa': '66506005147d6c73c1110115',
@@ -52,6 +167,59 @@ SUBSTORE_IDS = {
     'daman-and-diu': '66505ff024e61363e088c306',
 }
 
+# Intern both sides so lookups take CPython's pointer-compare fast path
+# (the hyphenated literals above aren't auto-interned like identifiers),
+# and freeze the mapping - it's only ever built here
+SUBSTORE_IDS = types.MappingProxyType(
+    {sys.intern(k): sys.intern(v) for k, v in SUBSTORE_IDS.items()}
+)
+
+# Reverse map for going from a stored substore _id back to its alias
+_ID_TO_ALIAS = types.MappingProxyType({v: k for k, v in SUBSTORE_IDS.items()})
+
+# Fallback pincode ranges for major cities, resolved to full substore
+# records at import time; a lookup is then one bisect over the sorted lows
+# instead of an if/elif ladder with a dict get and dict build per branch
+_FALLBACK_RANGES = sorted(
+    (low, high, {
+        "substore_id": SUBSTORE_IDS.get(alias),
+        "substore_name": sys.intern(alias),
+        "city": city,
+        "state": state,
+        "canonical_pincode": canonical,
+    })
+    for low, high, alias, city, state, canonical in [
+        # Maharashtra
+        (400001, 400104, 'mumbai-br', 'Mumbai', 'Maharashtra', '400001'),
+        (411001, 411060, 'pune-br', 'Pune', 'Maharashtra', '411001'),
+        (413001, 413736, 'solapur-br', 'Solapur', 'Maharashtra', '413001'),
+        (422001, 422605, 'nashik-br', 'Nashik', 'Maharashtra', '422001'),
+        (431001, 431542, 'aurangabad-br', 'Aurangabad', 'Maharashtra', '431001'),
+        # Delhi NCR
+        (110001, 110096, 'delhi', 'Delhi', 'Delhi', '110001'),
+        (201001, 203207, 'up-ncr', 'NCR', 'Uttar Pradesh', '201001'),
+        (244001, 247778, 'up-ncr', 'NCR', 'Uttar Pradesh', '201001'),
+        (121001, 122505, 'haryana', 'Gurgaon/Faridabad', 'Haryana', '122001'),
+        # Karnataka
+        (560001, 560110, 'karnataka', 'Bangalore', 'Karnataka', '560001'),
+        # Tamil Nadu
+        (600001, 600126, 'tamil-nadu-1', 'Chennai', 'Tamil Nadu', '600001'),
+        # Telangana
+        (500001, 500097, 'telangana', 'Hyderabad', 'Telangana', '500001'),
+        # Gujarat
+        (380001, 382481, 'gujarat', 'Ahmedabad', 'Gujarat', '380001'),
+        # West Bengal
+        (700001, 700156, 'west-bengal', 'Kolkata', 'West Bengal', '700001'),
+        # Rajasthan
+        (302001, 303807, 'rajasthan', 'Jaipur', 'Rajasthan', '302001'),
+        # Kerala
+        (682001, 695615, 'kerala', 'Kerala', 'Kerala', '695001'),
+        # Goa
+        (403001, 403806, 'goa', 'Goa', 'Goa', '403001'),
+    ]
+)
+_FALLBACK_LOWS = [r[0] for r in _FALLBACK_RANGES]
+
 
 class AmulAPI:
     """Amul Shop API Client using Playwright browser automation"""
@@ -61,205 +229,527 @@ class AmulAPI:
         self.substore_name = None
         self.pincode = None
         self.canonical_pincode = None  # Pincode to use for fetching products
-        self._products_cache = {}
-        self._pincode_cache = {}
-
-    def _get_substore_id(self, alias: str) -> Optional[str]:
-        """Get actual MongoDB _id from substore alias"""
-        return SUBSTORE_IDS.get(alias)
+        self._products_cache = _LRUCache(CACHE_MAX_ENTRIES)
+        # pincode -> (monotonic timestamp, data or None)
+        self._pincode_cache = _LRUCache(CACHE_MAX_ENTRIES)
+
+        # Second-level pincode cache in SQLite so browser-resolved mappings
+        # survive restarts (fallback-range hits aren't persisted; those are
+        # a bisect to recompute)
+        self._cache_db_lock = threading.Lock()
+        try:
+            self._cache_db = sqlite3.connect(PINCODE_DB_PATH, check_same_thread=False)
+            self._cache_db.execute(
+                "CREATE TABLE IF NOT EXISTS pincode "
+                "(pin TEXT PRIMARY KEY, data TEXT, ts INTEGER, schema INTEGER DEFAULT 0)"
+            )
+            self._cache_db.execute(
+                "CREATE TABLE IF NOT EXISTS products "
+                "(pin TEXT PRIMARY KEY, data TEXT, ts INTEGER, schema INTEGER DEFAULT 0)"
+            )
+            # DBs created before versioning predate the column; their rows
+            # stay at schema 0 and are simply never read back
+            for table in ("pincode", "products"):
+                try:
+                    self._cache_db.execute(
+                        f"ALTER TABLE {table} ADD COLUMN schema INTEGER DEFAULT 0"
+                    )
+                except sqlite3.OperationalError:
+                    pass  # column already present
+            self._cache_db.commit()
+        except Exception as e:
+            logger.warning("Pincode cache DB unavailable: %s", e)
+            self._cache_db = None
+        self._products_by_sku = {}  # sku -> product from the latest fetch
+
+        # One pooled keep-alive session for all direct HTTP calls to the Amul
+        # API. The instance is shared application-wide (bot handlers and the
+        # stock monitor), so connections are reused instead of paying a fresh
+        # TCP/TLS handshake per request.
+        self._session = requests.Session()
+        self._session.headers.update(config.HEADERS)
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=50,
+            max_retries=Retry(total=3, backoff_factor=0.3)
+        )
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+        # Captured from the first successful browser run: the exact products
+        # API URL and the headers (incl. cookies) Chromium sent for it. Once
+        # known, later fetches hit the JSON endpoint directly and skip the
+        # browser entirely.
+        self._products_api_url = None
+        self._api_headers = None
+
+        # Playwright objects live on a dedicated loop in a daemon thread so
+        # the browser can persist across calls (launching Chromium costs
+        # seconds; a fresh page on a warm browser is nearly free). Playwright
+        # connections are bound to the loop they start on, so every coroutine
+        # touching them is dispatched to this loop via _run_async.
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(
+            target=self._loop.run_forever, name="amul-playwright", daemon=True
+        ).start()
+        self._pw = None
+        self._browser = None
+        self._browser_lock = asyncio.Lock()
+        self._ctx_semaphore = asyncio.Semaphore(CONTEXT_POOL_SIZE)
+
+    # Get actual MongoDB _id from substore alias. Bound dict.get skips a
+    # method frame plus a module-global resolution per lookup.
+    _get_substore_id = staticmethod(SUBSTORE_IDS.get)
+
+    def _storage_state_path(self, pincode: str) -> str:
+        """Where this pincode's saved browser cookies live"""
+        return os.path.join(STORAGE_STATE_DIR, f"amul_{pincode}.json")
 
     def _run_async(self, coro):
-        """Run async code in sync context"""
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                # If loop is already running, use nest_asyncio or create new loop
-                import nest_asyncio
-                nest_asyncio.apply()
-                return loop.run_until_complete(coro)
-        except RuntimeError:
-            pass
-
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        """Run a coroutine on the dedicated Playwright loop and wait for it"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def prewarm(self):
+        """Kick off the browser launch in the background and return at once.
+
+        Chromium takes seconds to come up; starting the launch while the
+        caller is still doing its own startup work takes that cost off the
+        first fetch. _ensure_browser serializes on the browser lock, so a
+        fetch arriving mid-launch simply waits for this one to finish.
+        """
+        def _log_failure(fut):
+            exc = fut.exception()
+            if exc is not None:
+                logger.warning("Browser prewarm failed: %s", exc)
+
+        future = asyncio.run_coroutine_threadsafe(self._ensure_browser(), self._loop)
+        future.add_done_callback(_log_failure)
+
+    async def _ensure_browser(self):
+        """Launch the shared browser once; contexts are created per fetch"""
+        async with self._browser_lock:
+            if self._browser is not None:
+                return self._browser
+            self._pw = await async_playwright().start()
+            # Consolidate Chromium's process tree and skip GPU/shm features
+            # the headless scraper never uses; on a small VPS the browser
+            # is the dominant memory footprint
+            self._browser = await self._pw.chromium.launch(
+                headless=True,
+                args=[
+                    "--single-process",
+                    "--no-zygote",
+                    "--no-sandbox",
+                    "--disable-dev-shm-usage",
+                    "--disable-gpu",
+                ],
+            )
+            logger.info("Launched persistent browser")
+            return self._browser
+
+    async def _new_context(self, storage_state=None):
+        """A fresh context on the shared browser, with routing applied.
+
+        Contexts are per-fetch so concurrent pincodes never share cookie
+        state (the site scopes the selected pincode to the session); the
+        expensive part - the browser process - stays pooled.
+        """
+        context = await self._browser.new_context(
+            user_agent=config.HEADERS["user-agent"],
+            storage_state=storage_state
+        )
+        await context.route("**/*", self._route_handler)
+        return context
+
+    @staticmethod
+    async def _route_handler(route):
+        """Abort requests for resources the scraper doesn't need"""
+        request = route.request
+        if request.resource_type in BLOCKED_RESOURCE_TYPES:
+            await route.abort()
+        elif any(host in request.url for host in BLOCKED_HOSTS):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _reset_browser(self):
+        """Tear down a wedged browser so the next call relaunches it"""
+        async with self._browser_lock:
+            try:
+                if self._browser:
+                    await self._browser.close()
+                if self._pw:
+                    await self._pw.stop()
+            except Exception as e:
+                logger.warning("Browser teardown error: %s", e)
+            self._pw = None
+            self._browser = None
+
+    def close(self):
+        """Shut down the browser and its loop thread"""
         try:
-            return loop.run_until_complete(coro)
+            asyncio.run_coroutine_threadsafe(self._reset_browser(), self._loop).result(timeout=15)
+        except Exception as e:
+            logger.warning("Browser shutdown error: %s", e)
         finally:
-            loop.close()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            if self._cache_db is not None:
+                try:
+                    self._cache_db.close()
+                except Exception:
+                    pass
 
     async def _enter_pincode_and_fetch(self, pincode: str) -> dict:
         """Enter pincode in browser and fetch products"""
+        await self._ensure_browser()
+        # One pool slot per in-flight fetch caps open contexts/pages
+        async with self._ctx_semaphore:
+            return await self._pincode_fetch(pincode)
+
+    async def _pincode_fetch(self, pincode: str) -> dict:
+        """The actual per-context fetch; callers hold a pool slot"""
         result = {
             'pincode_info': None,
             'products': []
         }
 
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context(
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            )
-            page = await context.new_page()
-
-            # Track all network requests for debugging
-            all_requests = []
-            all_responses = []
-
-            async def handle_request(request):
-                url = request.url
-                if 'pincode' in url.lower() or 'entity' in url.lower():
-                    all_requests.append(url)
-                    logger.info(f"Request: {url}")
+        # A prior successful run for this pincode saved its cookies; a
+        # context restored from them has the pincode preselected, so the
+        # products XHR fires on page load with no input/dropdown dance
+        state_path = self._storage_state_path(pincode)
+        is_warm = os.path.exists(state_path)
+        try:
+            context = await self._new_context(storage_state=state_path if is_warm else None)
+        except Exception as e:
+            logger.warning("Could not restore storage state for %s: %s", pincode, e)
+            is_warm = False
+            context = await self._new_context()
+
+        page = await context.new_page()
+
+        # Track all network requests for debugging
+        all_requests = []
+        all_responses = []
+
+        # Signalled by the response handlers so waits are event-driven
+        # instead of fixed sleeps
+        pincode_event = asyncio.Event()
+        products_event = asyncio.Event()
+
+        # Debug-only tracing: at INFO and above this handler never runs, so
+        # the per-event substring scans and URL retention cost nothing
+        trace_requests = logger.isEnabledFor(logging.DEBUG)
+
+        # Methods bound via partial rather than fresh closures per fetch
+        # (no function-object/cell allocation on this path); the finally
+        # block unregisters them so late events can't fire against a
+        # torn-down fetch
+        handle_request = functools.partial(self._on_request, all_requests)
+        handle_response = functools.partial(
+            self._on_response, pincode, result,
+            pincode_event, products_event, all_responses
+        )
+
+        if trace_requests:
+            page.on('request', handle_request)
+        page.on('response', handle_response)
 
-            async def handle_response(response):
-                url = response.url
-                all_responses.append(url)
+        async def wait_for_signal(event: asyncio.Event, timeout: float) -> bool:
+            """Wait for a response handler to fire; False on timeout"""
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+                return True
+            except asyncio.TimeoutError:
+                return False
 
+        try:
+            # Go to protein page; goto already waits for the load event, so
+            # no extra settle sleep is needed before looking for the input
+            logger.info("Navigating to %s/en/browse/protein", config.AMUL_BASE_URL)
+            await page.goto(f'{config.AMUL_BASE_URL}/en/browse/protein', timeout=15000)
+
+            if is_warm:
+                # Warm path: just wait for the products XHR the restored
+                # cookies trigger on load
+                logger.info("Waiting for products (warm pincode %s)...", pincode)
+                if await wait_for_signal(products_event, 10):
+                    await asyncio.sleep(0.5)
+                else:
+                    # Saved state no longer selects the pincode; drop it
+                    # and fall through to the full flow in a clean context
+                    logger.info("Saved storage state is stale, using full flow")
+                    try:
+                        os.remove(state_path)
+                    except OSError:
+                        pass
+                    await page.close()
+                    await context.close()
+                    context = await self._new_context()
+                    page = await context.new_page()
+                    if trace_requests:
+                        page.on('request', handle_request)
+                    page.on('response', handle_response)
+                    await page.goto(f'{config.AMUL_BASE_URL}/en/browse/protein', timeout=15000)
+
+            if result['products']:
+                logger.info("Products found: %s", len(result['products']))
+                return result
+
+            # Find the pincode input: all candidates race in one selector
+            # union instead of serial per-candidate waits
+            pincode_input = None
+            try:
+                pincode_input = await page.wait_for_selector(PIN_INPUT_SELECTOR, timeout=5000)
+            except Exception:
+                pass
+
+            if pincode_input:
+                # Clear and enter pincode (OPTIMIZED: faster typing)
+                logger.info("Entering pincode: %s", pincode)
+                await pincode_input.click()
+                # fill() sets the value atomically (type() with a keystroke
+                # delay costs ~50ms per digit); the dispatched input event
+                # still triggers the site's debounced autocomplete
+                await pincode_input.fill(pincode)
+                await pincode_input.dispatch_event('input')
+                # The dropdown renders once the suggestion API responds, so
+                # wait on that response rather than a fixed delay
+                logger.info("Typed pincode, waiting for suggestions...")
+                await wait_for_signal(pincode_event, 3)
+
+                # Wait for dropdown suggestions and click the matching one;
+                # the candidate selectors race as one union
+                dropdown_found = False
                 try:
-                    # Log all API calls for debugging
-                    if '/entity/pincode' in url or 'pincode' in url.lower():
-                        logger.info(f"Pincode-related response URL: {url}")
-                        try:
-                            data = await response.json()
-                            logger.info(f"Pincode API response data: {data}")
-                            records = data.get('records', [])
-                            # Try exact match first
-                            for rec in records:
-                                if str(rec.get('pincode')) == str(pincode):
-                                    result['pincode_info'] = rec
-                                    logger.info(f"Found exact pincode match: {rec}")
-                                    break
-                            # If no exact match, use first record (partial match)
-                            if not result['pincode_info'] and records:
-                                result['pincode_info'] = records[0]
-                                logger.info(f"Using first pincode record: {records[0]}")
-                        except:
-                            text = await response.text()
-                            logger.info(f"Pincode response (not JSON): {text[:500]}")
-
-                    elif 'ms.products' in url and 'protein' in url.lower():
-                        data = await response.json()
-                        items = data.get('data', [])
-                        if items:
-                            result['products'].extend(items)
-                            logger.info(f"Found {len(items)} products")
+                    dropdown_item = await page.wait_for_selector(
+                        _DROPDOWN_SELECTOR_TMPL.format(p=pincode), timeout=3000
+                    )
+                    if dropdown_item:
+                        await dropdown_item.click()
+                        dropdown_found = True
                 except Exception as e:
-                    logger.error(f"Response handler error for {url}: {e}")
-                    pass
+                    logger.info("Dropdown search error: %s", e)
 
-            page.on('request', handle_request)
-            page.on('response', handle_response)
+                if not dropdown_found:
+                    logger.info("No dropdown found, pressing Enter")
+                    await page.keyboard.press('Enter')
+
+                # Wait for the products API response instead of sleeping a
+                # fixed 2s; the short grace period catches follow-up pages
+                # of the same listing
+                logger.info("Waiting for products to load...")
+                if await wait_for_signal(products_event, 10):
+                    await asyncio.sleep(0.5)
+
+                # Log final state
+                logger.info("Captured %s requests, %s responses", len(all_requests), len(all_responses))
+                logger.info("Pincode info found: %s", result['pincode_info'] is not None)
+                logger.info("Products found: %s", len(result['products']))
+
+                if result['products']:
+                    # Persist this pincode's cookies so later cold starts
+                    # skip the modal entirely
+                    os.makedirs(STORAGE_STATE_DIR, exist_ok=True)
+                    await context.storage_state(path=state_path)
+            else:
+                logger.error("Could not find pincode input field!")
 
+        except Exception as e:
+            logger.error("Browser automation error: %s", e)
+            # A crashed/disconnected browser would poison every later call;
+            # drop it so the next fetch starts clean
+            if self._browser is not None and not self._browser.is_connected():
+                await self._reset_browser()
+        finally:
+            # Unregister separately from teardown so a listener hiccup
+            # can't skip the page/context close
             try:
-                # Go to protein page (OPTIMIZED: reduced timeout)
-                logger.info(f"Navigating to {config.AMUL_BASE_URL}/en/browse/protein")
-                await page.goto(f'{config.AMUL_BASE_URL}/en/browse/protein', timeout=15000)
-                await asyncio.sleep(1)  # OPTIMIZED: 3s -> 1s
-
-                # Find and fill pincode input - try multiple selectors
-                pincode_input = None
-                selectors = [
-                    'input[type="tel"]',
-                    'input[placeholder*="pincode" i]',
-                    'input[name*="pincode" i]',
-                    'input[id*="pincode" i]',
-                    'input[class*="pincode" i]'
-                ]
-
-                for selector in selectors:
-                    try:
-                        pincode_input = await page.wait_for_selector(selector, timeout=2000)  # OPTIMIZED: 3s -> 2s
-                        if pincode_input:
-                            logger.info(f"Found pincode input with selector: {selector}")
+                if trace_requests:
+                    page.remove_listener('request', handle_request)
+                page.remove_listener('response', handle_response)
+            except Exception:
+                pass
+            try:
+                await page.close()
+                await context.close()
+            except Exception:
+                pass  # context dies with the browser on reset
+
+        return result
+
+    @staticmethod
+    async def _on_request(all_requests, request):
+        """Debug-only trace of pincode/entity API requests for one fetch"""
+        url = request.url
+        if 'pincode' in url or 'entity' in url:
+            all_requests.append(url)
+            logger.debug("Request: %s", url)
+
+    async def _on_response(self, pincode, result, pincode_event, products_event,
+                           all_responses, response):
+        """Sniff the pincode/products API responses for one fetch"""
+        # Both target endpoints are JS-initiated calls; gating on resource
+        # type first skips the substring scans for every static asset
+        if response.request.resource_type not in ('xhr', 'fetch'):
+            return
+        # The API paths are stable lowercase, so no per-event url.lower()
+        url = response.url
+        is_pincode = '/entity/pincode' in url or 'pincode' in url
+        is_products = 'ms.products' in url and 'protein' in url
+        if not is_pincode and not is_products:
+            return
+        all_responses.append(url)
+
+        try:
+            if is_pincode:
+                logger.info("Pincode-related response URL: %s", url)
+                try:
+                    data = _json_loads(await response.body())
+                    # Full payload dump is debug-only; rendering the dict
+                    # on every lookup is wasted work at INFO
+                    logger.debug("Pincode API response data: %s", data)
+                    records = data.get('records', [])
+                    # Try exact match first
+                    for rec in records:
+                        if str(rec.get('pincode')) == str(pincode):
+                            result['pincode_info'] = rec
+                            logger.debug("Found exact pincode match: %s", rec)
                             break
-                    except:
-                        continue
-
-                if pincode_input:
-                    # Clear and enter pincode (OPTIMIZED: faster typing)
-                    logger.info(f"Entering pincode: {pincode}")
-                    await pincode_input.click()
-                    await pincode_input.fill('')
-                    await asyncio.sleep(0.3)  # OPTIMIZED: 0.5s -> 0.3s
-                    await pincode_input.type(pincode, delay=50)  # OPTIMIZED: 100ms -> 50ms per char
-                    logger.info(f"Typed pincode, waiting for dropdown...")
-                    await asyncio.sleep(1.5)  # OPTIMIZED: 3s -> 1.5s
-
-                    # Wait for dropdown suggestions and click the matching one
-                    dropdown_found = False
-                    try:
-                        # Look for any dropdown item containing the pincode (more flexible selectors)
-                        dropdown_selectors = [
-                            f'li:has-text("{pincode}")',
-                            f'[role="option"]:has-text("{pincode}")',
-                            f'div[class*="option"]:has-text("{pincode}")',
-                            f'div[class*="dropdown"] >> text={pincode}',
-                            f'.dropdown-item:has-text("{pincode}")'
-                        ]
-
-                        for ds in dropdown_selectors:
-                            try:
-                                dropdown_item = await page.wait_for_selector(ds, timeout=1500)  # OPTIMIZED: 2s -> 1.5s
-                                if dropdown_item:
-                                    logger.info(f"Found dropdown with selector: {ds}")
-                                    await dropdown_item.click()
-                                    dropdown_found = True
-                                    await asyncio.sleep(1)  # OPTIMIZED: 3s -> 1s
-                                    break
-                            except:
-                                continue
-
-                    except Exception as e:
-                        logger.info(f"Dropdown search error: {e}")
-
-                    if not dropdown_found:
-                        logger.info("No dropdown found, pressing Enter")
-                        await page.keyboard.press('Enter')
-                        await asyncio.sleep(1)  # OPTIMIZED: 3s -> 1s
-
-                    # Wait for products to load (OPTIMIZED: reduced wait time)
-                    logger.info("Waiting for products to load...")
-                    await asyncio.sleep(2)  # OPTIMIZED: 5s -> 2s
-
-                    # Log final state
-                    logger.info(f"Captured {len(all_requests)} requests, {len(all_responses)} responses")
-                    logger.info(f"Pincode info found: {result['pincode_info'] is not None}")
-                    logger.info(f"Products found: {len(result['products'])}")
-                else:
-                    logger.error("Could not find pincode input field!")
+                    # If no exact match, use first record (partial match)
+                    if not result['pincode_info'] and records:
+                        result['pincode_info'] = records[0]
+                        logger.debug("Using first pincode record: %s", records[0])
+                    pincode_event.set()
+                except:
+                    text = await response.text()
+                    logger.info("Pincode response (not JSON): %s", text[:500])
+
+            elif is_products:
+                data = _json_loads(await response.body())
+                items = data.get('data', [])
+                if items:
+                    result['products'].extend(items)
+                    logger.info("Found %s products", len(items))
+                    products_event.set()
+                    # Remember how the browser called the products API so
+                    # later fetches can replay it without a page load
+                    if self._products_api_url is None:
+                        headers = await response.request.all_headers()
+                        self._api_headers = {
+                            k: v for k, v in headers.items()
+                            if not k.startswith(':')
+                        }
+                        self._products_api_url = url
+                        logger.info("Captured products API request for direct fetches")
+        except Exception as e:
+            logger.error("Response handler error for %s: %s", url, e)
+
+    def _cached_pincode(self, pincode: str):
+        """Return (hit, data) for a cached pincode lookup, honoring TTLs"""
+        entry = self._pincode_cache.get(pincode)
+        if entry is not None:
+            cached_at, data = entry
+            ttl = PINCODE_CACHE_TTL if data is not None else PINCODE_NEGATIVE_TTL
+            if time.monotonic() - cached_at < ttl:
+                return True, data
+            del self._pincode_cache[pincode]
+        # Memory miss: a previous process may have persisted the mapping
+        data = self._load_persisted_pincode(pincode)
+        if data is not None:
+            self._pincode_cache[pincode] = (time.monotonic(), data)
+            return True, data
+        return False, None
+
+    def _load_persisted_pincode(self, pincode: str) -> Optional[dict]:
+        """Fetch a still-fresh pincode mapping from the on-disk cache"""
+        if self._cache_db is None:
+            return None
+        try:
+            with self._cache_db_lock:
+                row = self._cache_db.execute(
+                    "SELECT data FROM pincode WHERE pin = ? AND ts > ? AND schema = ?",
+                    (pincode, int(time.time()) - PINCODE_PERSIST_TTL, CACHE_SCHEMA)
+                ).fetchone()
+            return json.loads(row[0]) if row else None
+        except Exception as e:
+            logger.warning("Pincode cache read failed: %s", e)
+            return None
 
-            except Exception as e:
-                logger.error(f"Browser automation error: {e}")
-            finally:
-                await browser.close()
+    def _persist_pincode(self, pincode: str, data: dict):
+        """Record a browser-resolved pincode mapping on disk"""
+        if self._cache_db is None:
+            return
+        try:
+            with self._cache_db_lock:
+                self._cache_db.execute(
+                    "INSERT OR REPLACE INTO pincode (pin, data, ts, schema) VALUES (?, ?, ?, ?)",
+                    (pincode, json.dumps(data), int(time.time()), CACHE_SCHEMA)
+                )
+                self._cache_db.commit()
+        except Exception as e:
+            logger.warning("Pincode cache write failed: %s", e)
 
-        return result
+    def _load_persisted_products(self, pincode: str) -> Optional[list]:
+        """Fetch a recent-enough product payload from the on-disk cache"""
+        if self._cache_db is None:
+            return None
+        try:
+            with self._cache_db_lock:
+                row = self._cache_db.execute(
+                    "SELECT data FROM products WHERE pin = ? AND ts > ? AND schema = ?",
+                    (pincode, int(time.time()) - PRODUCTS_PERSIST_TTL, CACHE_SCHEMA)
+                ).fetchone()
+            return json.loads(row[0]) if row else None
+        except Exception as e:
+            logger.warning("Products cache read failed: %s", e)
+            return None
+
+    def _persist_products(self, pincode: str, raw_products: list):
+        """Record the latest product payload for a pincode on disk"""
+        if self._cache_db is None:
+            return
+        try:
+            with self._cache_db_lock:
+                self._cache_db.execute(
+                    "INSERT OR REPLACE INTO products (pin, data, ts, schema) VALUES (?, ?, ?, ?)",
+                    (pincode, json.dumps(raw_products), int(time.time()), CACHE_SCHEMA)
+                )
+                self._cache_db.commit()
+        except Exception as e:
+            logger.warning("Products cache write failed: %s", e)
 
     def search_pincode(self, pincode: str) -> Optional[dict]:
         """Search for pincode and get substore info"""
-        if pincode in self._pincode_cache:
-            logger.info(f"Using cached pincode data for {pincode}")
-            return self._pincode_cache[pincode]
+        hit, cached = self._cached_pincode(pincode)
+        if hit:
+            logger.info("Using cached pincode data for %s", pincode)
+            return cached
+
+        # Validate and parse once here; everything downstream takes the int
+        pin_num = self._parse_pin(pincode)
+        if pin_num is None:
+            logger.warning("Rejecting malformed pincode: %r", pincode)
+            return None
 
         try:
-            logger.info(f"Searching for pincode: {pincode}")
+            logger.info("Searching for pincode: %s", pincode)
 
             # STRATEGY: Try fallback FIRST for known regions (fast & reliable)
             # Only use slow Playwright scraper if fallback doesn't match
-            fallback_data = self._get_fallback_substore(pincode)
+            fallback_data = self._get_fallback_substore(pincode, pin_num)
             if fallback_data:
-                logger.info(f"✓ Pincode {pincode} matched fallback region: {fallback_data['city']}, {fallback_data['state']}")
-                self._pincode_cache[pincode] = fallback_data
+                logger.info("✓ Pincode %s matched fallback region: %s, %s", pincode, fallback_data['city'], fallback_data['state'])
+                self._pincode_cache[pincode] = (time.monotonic(), fallback_data)
                 self.pincode = pincode
                 self.substore_id = fallback_data['substore_id']
                 self.substore_name = fallback_data['substore_name']
                 # Use canonical pincode for product fetching (e.g., 400001 instead of 400063)
                 self.canonical_pincode = fallback_data.get('canonical_pincode', pincode)
-                logger.info(f"Using canonical pincode {self.canonical_pincode} for product fetching")
+                logger.info("Using canonical pincode %s for product fetching", self.canonical_pincode)
                 return fallback_data
 
             # If fallback didn't match, try Playwright scraper (slower)
-            logger.info(f"No fallback match, trying browser automation for {pincode}...")
+            logger.info("No fallback match, trying browser automation for %s...", pincode)
             result = self._run_async(self._enter_pincode_and_fetch(pincode))
 
             if result['pincode_info']:
@@ -274,8 +764,9 @@ class AmulAPI:
                     "state": info.get("state", "")
                 }
 
-                logger.info(f"✓ Playwright found pincode: {pincode_data}")
-                self._pincode_cache[pincode] = pincode_data
+                logger.info("✓ Playwright found pincode: %s", pincode_data)
+                self._pincode_cache[pincode] = (time.monotonic(), pincode_data)
+                self._persist_pincode(pincode, pincode_data)
                 self.pincode = pincode
                 self.substore_id = pincode_data['substore_id']
                 self.substore_name = pincode_data['substore_name']
@@ -283,233 +774,193 @@ class AmulAPI:
 
                 # Also cache products if we got them
                 if result['products']:
-                    self._products_cache[pincode] = result['products']
-                    logger.info(f"Cached {len(result['products'])} products for pincode {pincode}")
+                    self._products_cache[pincode] = (time.monotonic(), result['products'])
+                    logger.info("Cached %s products for pincode %s", len(result['products']), pincode)
 
                 return pincode_data
 
-            logger.warning(f"✗ Pincode {pincode} not found via API or fallback")
+            logger.warning("✗ Pincode %s not found via API or fallback", pincode)
+            # Negative-cache so repeat attempts with a bad pincode are instant
+            self._pincode_cache[pincode] = (time.monotonic(), None)
             return None
 
         except Exception as e:
-            logger.error(f"Pincode search error for {pincode}: {e}", exc_info=True)
+            logger.error("Pincode search error for %s: %s", pincode, e, exc_info=True)
             return None
 
-    def _get_fallback_substore(self, pincode: str) -> Optional[dict]:
-        """Get fallback substore based on pincode range - covers major Indian cities"""
-        try:
-            pin_num = int(pincode)
-
-            # Maharashtra
-            if 400001 <= pin_num <= 400104:  # Mumbai
-                return {
-                    "pincode": pincode,
-                    "substore_id": self._get_substore_id('mumbai-br'),
-                    "substore_name": "mumbai-br",
-                    "city": "Mumbai",
-                    "state": "Maharashtra",
-                    "canonical_pincode": "400001"  # Use this for fetching products
-                }
-            elif 411001 <= pin_num <= 411060:  # Pune
-                return {
-                    "pincode": pincode,
-                    "substore_id": self._get_substore_id('pune-br'),
-                    "substore_name": "pune-br",
-                    "city": "Pune",
-                    "state": "Maharashtra",
-                    "canonical_pincode": "411001"
-                }
-            elif 413001 <= pin_num <= 413736:  # Solapur
-                return {
-                    "pincode": pincode,
-                    "substore_id": self._get_substore_id('solapur-br'),
-                    "substore_name": "solapur-br",
-                    "city": "Solapur",
-                    "state": "Maharashtra",
-                    "canonical_pincode": "413001"
-                }
-            elif 422001 <= pin_num <= 422605:  # Nashik
-                return {
-                    "pincode": pincode,
-                    "substore_id": self._get_substore_id('nashik-br'),
-                    "substore_name": "nashik-br",
-                    "city": "Nashik",
-                    "state": "Maharashtra",
-                    "canonical_pincode": "422001"
-                }
-            elif 431001 <= pin_num <= 431542:  # Aurangabad
-                return {
-                    "pincode": pincode,
-                    "substore_id": self._get_substore_id('aurangabad-br'),
-                    "substore_name": "aurangabad-br",
-                    "city": "Aurangabad",
-                    "state": "Maharashtra",
-                    "canonical_pincode": "431001"
-                }
-
-            # Delhi NCR
-            elif 110001 <= pin_num <= 110096:  # Delhi
-                return {
-                    "pincode": pincode,
-                    "substore_id": self._get_substore_id('delhi'),
-                    "substore_name": "delhi",
-                    "city": "Delhi",
-                    "state": "Delhi",
-                    "canonical_pincode": "110001"
-                }
-            elif 201001 <= pin_num <= 203207 or 244001 <= pin_num <= 247778:  # UP NCR (Noida, Ghaziabad, etc.)
-                return {
-                    "pincode": pincode,
-                    "substore_id": self._get_substore_id('up-ncr'),
-                    "substore_name": "up-ncr",
-                    "city": "NCR",
-                    "state": "Uttar Pradesh",
-                    "canonical_pincode": "201001"
-                }
-            elif 121001 <= pin_num <= 122505:  # Haryana (Gurgaon, Faridabad)
-                return {
-                    "pincode": pincode,
-                    "substore_id": self._get_substore_id('haryana'),
-                    "substore_name": "haryana",
-                    "city": "Gurgaon/Faridabad",
-                    "state": "Haryana",
-                    "canonical_pincode": "122001"
-                }
-
-            # Karnataka
-            elif 560001 <= pin_num <= 560110:  # Bangalore
-                return {
-                    "pincode": pincode,
-                    "substore_id": self._get_substore_id('karnataka'),
-                    "substore_name": "karnataka",
-                    "city": "Bangalore",
-                    "state": "Karnataka",
-                    "canonical_pincode": "560001"
-                }
-
-            # Tamil Nadu
-            elif 600001 <= pin_num <= 600126:  # Chennai
-                return {
-                    "pincode": pincode,
-                    "substore_id": self._get_substore_id('tamil-nadu-1'),
-                    "substore_name": "tamil-nadu-1",
-                    "city": "Chennai",
-                    "state": "Tamil Nadu",
-                    "canonical_pincode": "600001"
-                }
-
-            # Telangana
-            elif 500001 <= pin_num <= 500097:  # Hyderabad
-                return {
-                    "pincode": pincode,
-                    "substore_id": self._get_substore_id('telangana'),
-                    "substore_name": "telangana",
-                    "city": "Hyderabad",
-                    "state": "Telangana",
-                    "canonical_pincode": "500001"
-                }
+    @staticmethod
+    def _parse_pin(pincode) -> Optional[int]:
+        """Numeric value of a well-formed 6-digit pincode, else None.
 
-            # Gujarat
-            elif 380001 <= pin_num <= 382481:  # Ahmedabad
-                return {
-                    "pincode": pincode,
-                    "substore_id": self._get_substore_id('gujarat'),
-                    "substore_name": "gujarat",
-                    "city": "Ahmedabad",
-                    "state": "Gujarat",
-                    "canonical_pincode": "380001"
-                }
+        Cheaper than int() in a try/except on the hot path - malformed
+        input is answered by two string checks, not a raised exception.
+        """
+        if isinstance(pincode, str) and len(pincode) == 6 and pincode.isdigit():
+            return int(pincode)
+        return None
 
-            # West Bengal
-            elif 700001 <= pin_num <= 700156:  # Kolkata
-                return {
-                    "pincode": pincode,
-                    "substore_id": self._get_substore_id('west-bengal'),
-                    "substore_name": "west-bengal",
-                    "city": "Kolkata",
-                    "state": "West Bengal",
-                    "canonical_pincode": "700001"
-                }
+    def _get_fallback_substore(self, pincode: str, pin_num: int = None) -> Optional[dict]:
+        """Get fallback substore based on pincode range - covers major Indian cities"""
+        if pin_num is None:
+            pin_num = self._parse_pin(pincode)
+            if pin_num is None:
+                logger.debug("Fallback check failed for %s: not a 6-digit pincode", pincode)
+                return None
+        i = bisect_right(_FALLBACK_LOWS, pin_num) - 1
+        if i >= 0:
+            low, high, record = _FALLBACK_RANGES[i]
+            if pin_num <= high:
+                return {"pincode": pincode, **record}
+        return None
 
-            # Rajasthan
-            elif 302001 <= pin_num <= 303807:  # Jaipur
-                return {
-                    "pincode": pincode,
-                    "substore_id": self._get_substore_id('rajasthan'),
-                    "substore_name": "rajasthan",
-                    "city": "Jaipur",
-                    "state": "Rajasthan",
-                    "canonical_pincode": "302001"
-                }
+    def _fetch_products_direct(self, substore_id: str = None) -> Optional[list]:
+        """Hit the products JSON endpoint directly, skipping the browser.
 
-            # Kerala
-            elif 682001 <= pin_num <= 695615:  # Kerala (Kochi, Trivandrum)
-                return {
-                    "pincode": pincode,
-                    "substore_id": self._get_substore_id('kerala'),
-                    "substore_name": "kerala",
-                    "city": "Kerala",
-                    "state": "Kerala",
-                    "canonical_pincode": "695001"
-                }
+        Uses the URL and headers captured from the first browser run, with
+        the substore query parameter swapped for the requested one. Returns
+        the raw product list, or None when the fast path isn't available
+        (nothing captured yet, auth expired, or an unexpected response) so
+        the caller falls back to the full browser flow.
+        """
+        if not self._products_api_url:
+            return None
 
-            # Goa
-            elif 403001 <= pin_num <= 403806:  # Goa
-                return {
-                    "pincode": pincode,
-                    "substore_id": self._get_substore_id('goa'),
-                    "substore_name": "goa",
-                    "city": "Goa",
-                    "state": "Goa",
-                    "canonical_pincode": "403001"
-                }
+        url = self._products_api_url
+        if substore_id:
+            parts = urlparse(url)
+            params = dict(parse_qsl(parts.query))
+            if 'substore' not in params:
+                # Can't retarget the captured call at another substore
+                return None
+            params['substore'] = substore_id
+            url = parts._replace(query=urlencode(params)).geturl()
 
+        try:
+            resp = self._session.get(url, headers=self._api_headers, timeout=10)
+            if resp.status_code != 200:
+                logger.warning("Direct products fetch returned %s", resp.status_code)
+                if resp.status_code in (401, 403):
+                    # Session cookies expired; recapture on the next browser run
+                    self._products_api_url = None
+                    self._api_headers = None
+                return None
+            items = _json_loads(resp.content).get('data', [])
+            return items or None
         except Exception as e:
-            logger.debug(f"Fallback check failed for {pincode}: {e}")
-
-        return None
+            logger.warning("Direct products fetch failed: %s", e)
+            return None
 
     def get_protein_products(self, substore_id: str = None) -> List[dict]:
         """Fetch all protein products with stock info - always gets fresh data"""
         # Use canonical pincode if available (e.g., 400001 instead of 400063)
         # This ensures Amul website recognizes the pincode
         pincode = self.canonical_pincode or self.pincode
+        if not pincode:
+            pincode = '400001'  # Default Mumbai pincode
+
+        # Serve a recent scrape if one exists - users on the same substore
+        # trigger identical fetches within seconds of each other
+        cached = self._products_cache.get(pincode)
+        # Disk is only consulted when this process has never fetched the
+        # pincode (fresh restart). An expired in-memory entry means we
+        # already fetched once, so refetch rather than reread our own
+        # stale snapshot.
+        persisted = None if cached else self._load_persisted_products(pincode)
+        if cached and time.monotonic() - cached[0] < PRODUCTS_CACHE_TTL:
+            logger.info("Using cached products for pincode %s", pincode)
+            raw_products = cached[1]
+        elif persisted is not None:
+            logger.info("Using persisted products for pincode %s", pincode)
+            raw_products = persisted
+            self._products_cache[pincode] = (time.monotonic(), raw_products)
+        else:
+            try:
+                # Fast path: replay the captured API call over the pooled
+                # HTTP session (~100ms) instead of a full browser render
+                raw_products = self._fetch_products_direct(substore_id)
+                if raw_products:
+                    logger.info("Fetched %s products via direct API", len(raw_products))
+                else:
+                    logger.info("Fetching products using pincode: %s", pincode)
+                    result = self._run_async(self._enter_pincode_and_fetch(pincode))
+                    raw_products = result.get('products', [])
 
-        # Always fetch fresh stock data (don't use stale cache)
-        try:
-            if not pincode:
-                pincode = '400001'  # Default Mumbai pincode
-
-            logger.info(f"Fetching products using pincode: {pincode}")
-            result = self._run_async(self._enter_pincode_and_fetch(pincode))
-            raw_products = result.get('products', [])
+                if not raw_products:
+                    logger.warning("No products returned for pincode %s", pincode)
+                    return []
 
-            if not raw_products:
-                logger.warning(f"No products returned for pincode {pincode}")
+                # Update cache with fresh data
+                self._products_cache[pincode] = (time.monotonic(), raw_products)
+                self._persist_products(pincode, raw_products)
+            except Exception as e:
+                logger.error("Get products error: %s", e)
+                # Don't use stale cache - return empty list to force retry
                 return []
 
-            # Update cache with fresh data
-            self._products_cache[pincode] = raw_products
-        except Exception as e:
-            logger.error(f"Get products error: {e}")
-            # Don't use stale cache - return empty list to force retry
-            return []
+        return self._process_products(raw_products)
+
+    async def _fetch_products_many(self, pincodes: list) -> dict:
+        """Scrape several pincodes concurrently on the browser loop.
+
+        The context pool inside _enter_pincode_and_fetch caps how many run
+        at once; everything past that just queues on a pool slot.
+        """
+        async def fetch_one(pincode):
+            return pincode, await self._enter_pincode_and_fetch(pincode)
+
+        return dict(await asyncio.gather(*(fetch_one(p) for p in pincodes)))
+
+    def get_protein_products_batch(self, pincodes: list) -> dict:
+        """Fetch products for several pincodes at once; {pincode: products}.
 
-        # Process products
-        products = []
-        seen_skus = set()
+        Cache hits are served as usual; the misses share one gather with a
+        context per pincode on the persistent browser, capped by the
+        context pool so a long list doesn't open dozens at once.
+        """
+        out = {}
+        misses = []
+        for pincode in pincodes:
+            cached = self._products_cache.get(pincode)
+            if cached and time.monotonic() - cached[0] < PRODUCTS_CACHE_TTL:
+                out[pincode] = self._process_products(cached[1])
+            else:
+                misses.append(pincode)
+
+        if misses:
+            try:
+                results = self._run_async(self._fetch_products_many(misses))
+            except Exception as e:
+                logger.error("Batch products fetch error: %s", e)
+                results = {}
+            for pincode in misses:
+                raw = results.get(pincode, {}).get('products', [])
+                if raw:
+                    self._products_cache[pincode] = (time.monotonic(), raw)
+                    self._persist_products(pincode, raw)
+                out[pincode] = self._process_products(raw)
+
+        return out
+
+    def _process_products(self, raw_products: list) -> List[dict]:
+        """Turn raw API items into the product dicts the rest of the bot uses"""
+        # Dedupe by SKU as we go; the dict doubles as the lookup index used
+        # by the per-SKU methods below
+        by_sku = {}
+        # Hoisted so the loop body doesn't re-resolve it per product
+        get_image_url = self._get_image_url
 
         for item in raw_products:
-            sku = item.get('sku')
-            if sku and sku not in seen_skus:
-                seen_skus.add(sku)
+            # Bind item.get once; the dict build below calls it ten times
+            get = item.get
+            sku = get('sku')
+            if sku and sku not in by_sku:
 
                 # Get quantity - try multiple fields in priority order:
                 # 1. 'available' - location-specific stock (if > 1)
                 # 2. 'inventory_quantity' - total stock
                 # 3. Default to 0
-                available = item.get("available", 0)
-                inventory_qty = item.get("inventory_quantity", 0)
+                available = get("available", 0)
+                inventory_qty = get("inventory_quantity", 0)
 
                 # If 'available' is just a boolean indicator (0 or 1), use inventory_quantity instead
                 if isinstance(available, (int, float)) and available > 1:
@@ -519,33 +970,39 @@ class AmulAPI:
                 else:
                     quantity = 0
 
-                logger.debug(f"Product {sku}: available={available}, inventory_quantity={inventory_qty}, using quantity={quantity}")
+                logger.debug("Product %s: available=%s, inventory_quantity=%s, using quantity=%s",
+                             sku, available, inventory_qty, quantity)
 
+                alias = get("alias") or ''
                 product = {
-                    "id": item.get("_id"),
-                    "name": item.get("name"),
+                    "id": get("_id"),
+                    "name": get("name"),
                     "sku": sku,
-                    "alias": item.get("alias"),
-                    "price": item.get("price", 0),
-                    "compare_price": item.get("compare_price", 0),
+                    "alias": alias,
+                    "price": get("price", 0),
+                    "compare_price": get("compare_price", 0),
                     "quantity": quantity,
-                    "allow_out_of_stock": item.get("inventory_allow_out_of_stock", False),
+                    "allow_out_of_stock": get("inventory_allow_out_of_stock", False),
                     "in_stock": quantity > 0,
-                    "image_url": self._get_image_url(item.get("images", [])),
-                    "product_url": f"{config.AMUL_BASE_URL}/en/product/{item.get('alias', '')}"
+                    "image_url": get_image_url(get("images", [])),
+                    "product_url": _PRODUCT_URL_PREFIX + alias
                 }
-                products.append(product)
+                by_sku[sku] = product
 
-        return products
+        self._products_by_sku = by_sku
+
+        return list(by_sku.values())
 
     def _get_image_url(self, images: list) -> str:
         """Extract first image URL from images array"""
-        if images and len(images) > 0:
-            img = images[0]
-            if isinstance(img, dict):
-                return img.get("image", "") or img.get("url", "")
-            return str(img)
-        return ""
+        if not images:
+            return ""
+        img = images[0]
+        # The API returns a list of dicts in practice; exact type check
+        # skips the isinstance MRO walk on the hot shape
+        if type(img) is dict:
+            return img.get("image", "") or img.get("url", "")
+        return str(img)
 
     def init_session(self) -> bool:
         """Initialize - returns True (browser handles sessions)"""
@@ -557,37 +1014,42 @@ class AmulAPI:
         self.substore_id = substore_id
 
         # Try to get canonical pincode from cache first
-        if pincode in self._pincode_cache:
-            cached_data = self._pincode_cache[pincode]
+        hit, cached_data = self._cached_pincode(pincode)
+        if hit and cached_data:
             self.canonical_pincode = cached_data.get('canonical_pincode', pincode)
             self.substore_name = cached_data.get('substore_name', '')
-            logger.info(f"Set pincode {pincode} (from cache), using canonical {self.canonical_pincode}")
+            logger.info("Set pincode %s (from cache), using canonical %s", pincode, self.canonical_pincode)
         else:
             # Cache miss - check fallback mapping to determine canonical pincode
             fallback_data = self._get_fallback_substore(pincode)
             if fallback_data:
                 self.canonical_pincode = fallback_data.get('canonical_pincode', pincode)
                 self.substore_name = fallback_data.get('substore_name', '')
-                logger.info(f"Set pincode {pincode} (from fallback), using canonical {self.canonical_pincode}")
+                # Memoize like search_pincode does, so the next set_pincode
+                # for this pincode is a cache hit instead of a fresh
+                # range lookup - pincodes repeat heavily across users
+                self._pincode_cache[pincode] = (time.monotonic(), fallback_data)
+                logger.info("Set pincode %s (from fallback), using canonical %s", pincode, self.canonical_pincode)
             else:
                 # Not in fallback mapping, use pincode as-is
                 self.canonical_pincode = pincode
-                logger.info(f"Set pincode {pincode}, no fallback found, using as-is")
+                logger.info("Set pincode %s, no fallback found, using as-is", pincode)
 
         return True
 
     def get_product_stock(self, sku: str, substore_id: str = None) -> Optional[dict]:
         """Get stock info for a specific product"""
-        products = self.get_protein_products(substore_id)
-        for product in products:
-            if product.get("sku") == sku:
-                return {
-                    "sku": product["sku"],
-                    "name": product["name"],
-                    "quantity": product["quantity"],
-                    "in_stock": product["in_stock"],
-                    "price": product["price"]
-                }
+        # Refreshes the cache/index if stale; usually a cache hit
+        self.get_protein_products(substore_id)
+        product = self._products_by_sku.get(sku)
+        if product:
+            return {
+                "sku": product["sku"],
+                "name": product["name"],
+                "quantity": product["quantity"],
+                "in_stock": product["in_stock"],
+                "price": product["price"]
+            }
         return None
 
     def get_in_stock_products(self, substore_id: str = None) -> List[dict]:
@@ -597,11 +1059,13 @@ class AmulAPI:
 
     def check_stock_for_skus(self, skus: list, substore_id: str = None) -> dict:
         """Check stock for multiple SKUs"""
-        products = self.get_protein_products(substore_id)
+        self.get_protein_products(substore_id)
         result = {}
-        for product in products:
-            if product.get("sku") in skus:
-                result[product["sku"]] = {
+        # Iterate the requested SKUs (usually far fewer than the catalog)
+        for sku in skus:
+            product = self._products_by_sku.get(sku)
+            if product:
+                result[sku] = {
                     "name": product["name"],
                     "quantity": product["quantity"],
                     "in_stock": product["in_stock"],
@@ -610,6 +1074,30 @@ class AmulAPI:
                 }
         return result
 
+    def invalidate(self, pincode: str = None):
+        """Drop cached products so the next read fetches fresh data.
+
+        Called by whoever knows stock may have moved (the monitor at the
+        top of each poll cycle); in between, reads trust the cache. With no
+        pincode, every cached product list is dropped.
+        """
+        if pincode is not None:
+            self._products_cache.pop(pincode, None)
+        else:
+            self._products_cache.clear()
+        # Drop the restart snapshots too, so an invalidated pincode can't
+        # be served from disk by a process that restarts mid-cycle
+        if self._cache_db is not None:
+            try:
+                with self._cache_db_lock:
+                    if pincode is not None:
+                        self._cache_db.execute("DELETE FROM products WHERE pin = ?", (pincode,))
+                    else:
+                        self._cache_db.execute("DELETE FROM products")
+                    self._cache_db.commit()
+            except Exception as e:
+                logger.warning("Products cache invalidation failed: %s", e)
+
     def clear_cache(self):
         """Clear cached data"""
         self._products_cache.clear()
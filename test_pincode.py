@@ -14,12 +14,11 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
-def test_pincode(pincode):
+def test_pincode(api, pincode):
     print(f"\n{'='*60}")
     print(f"Testing pincode: {pincode}")
     print('='*60)
 
-    api = AmulAPI()
     result = api.search_pincode(pincode)
 
     if result:
@@ -54,9 +53,15 @@ if __name__ == "__main__":
         "400063",  # Mumbai - the one user reported (should use 400001 for products)
     ]
 
+    # One shared client so every case reuses the same browser instead of
+    # paying a Chromium launch per pincode
+    api = AmulAPI()
     results = {}
-    for pincode in test_cases:
-        results[pincode] = test_pincode(pincode)
+    try:
+        for pincode in test_cases:
+            results[pincode] = test_pincode(api, pincode)
+    finally:
+        api.close()
 
     print(f"\n{'='*60}")
     print("SUMMARY:")
@@ -15,46 +15,62 @@ logging.basicConfig(
 
 def test_set_pincode_with_empty_cache():
     """Simulate what happens when bot restarts and needs to load products"""
-    print("\n" + "="*60)
-    print("TESTING: set_pincode with empty cache (bot restart scenario)")
-    print("="*60)
+    # Report lines are buffered and written once at the end: one write()
+    # syscall instead of a line-buffered flush per print when stdout is a
+    # pipe in a batch harness
+    out = []
+    out.append("\n" + "="*60)
+    out.append("TESTING: set_pincode with empty cache (bot restart scenario)")
+    out.append("="*60)
 
     # Simulate: User previously set pincode 400063, it's saved in DB
     # Now bot restarts, cache is empty, and we need to load products
 
     api = AmulAPI()  # New instance, empty cache
+    # Overlap the Chromium launch with the setup below instead of paying
+    # for it inside get_protein_products
+    api.prewarm()
 
     # This is what handlers.py does when showing products
     user_pincode = "400063"
     user_substore_id = "66506000c8f2d6e221b9193a"
 
-    print(f"\n1. Calling set_pincode({user_pincode}, {user_substore_id})")
+    out.append(f"\n1. Calling set_pincode({user_pincode}, {user_substore_id})")
     api.set_pincode(user_pincode, user_substore_id)
 
-    print(f"\n2. Instance state after set_pincode:")
-    print(f"   pincode: {api.pincode}")
-    print(f"   canonical_pincode: {api.canonical_pincode}")
-    print(f"   substore_id: {api.substore_id}")
+    out.append(f"\n2. Instance state after set_pincode:")
+    out.append(f"   pincode: {api.pincode}")
+    out.append(f"   canonical_pincode: {api.canonical_pincode}")
+    out.append(f"   substore_id: {api.substore_id}")
 
-    print(f"\n3. Attempting to fetch products...")
+    out.append(f"\n3. Attempting to fetch products...")
     try:
-        products = api.get_protein_products()
+        try:
+            products = api.get_protein_products()
+        finally:
+            api.close()
         if products:
-            print(f"   [SUCCESS] Loaded {len(products)} products")
-            print(f"\n   Sample products with quantities:")
+            out.append(f"   [SUCCESS] Loaded {len(products)} products")
+            out.append(f"\n   Sample products with quantities:")
             for i, p in enumerate(products[:5], 1):
                 stock_status = f"In Stock (Qty: {p['quantity']})" if p['in_stock'] else "Out of Stock"
-                print(f"   {i}. {p['name'][:50]}")
-                print(f"      Rs.{p['price']} - {stock_status}")
+                out.append(f"   {i}. {p['name'][:50]}")
+                out.append(f"      Rs.{p['price']} - {stock_status}")
             return True
         else:
-            print("   [FAILED] No products returned")
+            out.append("   [FAILED] No products returned")
             return False
     except Exception as e:
-        print(f"   [ERROR] {e}")
+        out.append(f"   [ERROR] {e}")
+        sys.stdout.write("\n".join(out) + "\n")
+        out = []
+        sys.stdout.flush()
         import traceback
         traceback.print_exc()
         return False
+    finally:
+        if out:
+            sys.stdout.write("\n".join(out) + "\n")
 
 if __name__ == "__main__":
     success = test_set_pincode_with_empty_cache()